@@ -0,0 +1,162 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Generate synthetic source files for benchmarking.
+
+source writes a file in the comment syntax of any language class in
+txt2boil.langs, with control over its size, how much of it is
+comments, how many block comments and marker comments it has, and how
+many triggers those markers find in the code.
+
+"""
+
+import os
+import random
+from txt2boil import comments
+from txt2boil import langs
+
+
+def syntax(cls):
+    """Return the line comment prefix and the block comment delimiters
+    of the language class cls, each None if it has no such comments.
+
+    """
+
+    line = None
+    for base, prefix in [(comments.Shell, '# '), (comments.Lisp, ';; '),
+                         (comments.CXX, '// '), (comments.TeX, '% ')]:
+        if issubclass(cls, base):
+            line = prefix
+            break
+    block = ('/* ', '*/') if issubclass(cls, comments.C) else None
+    return line, block
+
+
+def _comment(cls, lines):
+    """Return lines (each ending with a newline) as one comment."""
+
+    line, block = syntax(cls)
+    if line is not None:
+        return ''.join(line + l for l in lines)
+    return block[0] + ''.join(lines) + block[1] + '\n'
+
+
+def parameters(cls, params, generated=True):
+    """Return a copy of the source parameters params as source uses them
+    for the language class cls.
+
+    All the block comments of a language without line comments form
+    one chunk, which gen rejects as a marker if they aren't back to
+    back, so if the source is to be generated such languages get at
+    most one Line Gen marker and no other comments.
+
+    """
+
+    params = dict(params)
+    if generated and syntax(cls)[0] is None:
+        params.update(density=0, blocks=0, pygens=0,
+                      markers=min(params.get('markers', 1), 1))
+    return params
+
+
+def source(cls, lines=1000, density=0.2, blocks=10, markers=5,
+           triggers=50, pygens=0, seed=0, generated=True):
+    """Return a synthetic source file for the language class cls.
+
+    lines     - the number of lines of code and ordinary comments
+    density   - the fraction of those lines that are comments
+    blocks    - the number of block comments, where cls has them
+    markers   - the number of Line Gen marker comments
+    triggers  - the number of trigger matches spread over the code
+    pygens    - the number of Python Gen marker comments
+    seed      - the seed of the random choices
+    generated - whether the source is to be generated rather than
+                only have its comments extracted, which limits the
+                parameters as described for parameters
+
+    """
+
+    p = parameters(cls, dict(density=density, blocks=blocks,
+                             markers=markers, pygens=pygens), generated)
+    density, blocks, markers, pygens = (p['density'], p['blocks'],
+                                        p['markers'], p['pygens'])
+    rnd = random.Random(seed)
+    line, block = syntax(cls)
+    body = []
+    for i in range(lines):
+        if rnd.random() < density:
+            body.append(_comment(cls, ['note {} about the code\n'.format(i)]))
+        else:
+            body.append('value{0} = compute({0})\n'.format(i))
+
+    # Spread the triggers, each naming one of the markers, over the
+    # code.
+    for i in range(triggers):
+        k = rnd.randrange(max(markers, 1))
+        n = rnd.randrange(len(body) + 1)
+        body.insert(n, 'use(t{}_{})\n'.format(k, i))
+
+    if block is not None:
+        for i in range(blocks):
+            n = rnd.randrange(len(body) + 1)
+            body.insert(n, '{} block {} {}\n'.format(block[0], i, block[1]))
+
+    # Markers are separated from what follows them by a blank line,
+    # which starts their generated region.
+    out = []
+    step = max(1, len(body) // (markers + pygens + 1))
+    for i in range(markers):
+        out.append(_comment(cls, ['Line Gen:\n', 't{}_(\\d+)\n'.format(i),
+                                  'define(\\g<0>, \\1)\n']))
+        out.append('\n')
+        out.extend(body[i * step:(i + 1) * step])
+        out.append('\n')
+    for i in range(pygens):
+        out.append(_comment(cls, ['Python Gen:\n',
+                                  'return "calls {}".format('
+                                  'env.count("compute("))\n']))
+        out.append('\n')
+        n = markers + i
+        out.extend(body[n * step:(n + 1) * step])
+        out.append('\n')
+    out.extend(body[(markers + pygens) * step:])
+    return ''.join(out)
+
+
+def write(directory, files=10, **params):
+    """Write files synthetic sources for each language to directory and
+    return their names.
+
+    The params are passed on to source, with a different seed for each
+    file.
+
+    """
+
+    names = []
+    for nm in langs.__all__:
+        cls = getattr(langs, nm)
+        for i in range(files):
+            fname = os.path.join(directory,
+                                 '{}{}{}'.format(nm.lower(), i, cls.ext[0]))
+            with open(fname, 'w') as f:
+                f.write(source(cls, seed=i, **params))
+            names.append(fname)
+    return names
+
+
+__all__ = ['syntax', 'parameters', 'source', 'write']
@@ -0,0 +1,307 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Time txt2boil on synthetic sources and save the results as JSON.
+
+Run it from the top of the source tree with
+
+    python -m bench.run -o results.json
+
+and compare two runs with
+
+    python -m bench.run --compare old.json new.json
+
+Each benchmark is run repeat times and its minimum and median times,
+in seconds, are recorded along with the parameters of the corpus it
+was run on.  Before anything is timed, gen's output on each corpus is
+checked: generating it again must leave it alone, and the incremental
+and streaming generators must agree with it.
+
+"""
+
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import txt2boil
+from txt2boil import langs
+from txt2boil import pygen
+from . import corpus
+
+
+# The corpora each language is timed on, by name.
+scenarios = {
+    'small': dict(lines=200, density=0.2, blocks=5, markers=2,
+                  triggers=20),
+    'large': dict(lines=20000, density=0.2, blocks=200, markers=20,
+                  triggers=2000),
+    'dense': dict(lines=5000, density=0.8, blocks=500, markers=10,
+                  triggers=500),
+    'markers': dict(lines=5000, density=0.1, blocks=50, markers=500,
+                    triggers=5000),
+}
+
+
+def timeit(func, repeat, setup=None):
+    """Return the minimum and median time of repeat calls to func.
+
+    setup, if given, is called before each call to func without being
+    timed.
+
+    """
+
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        begin = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - begin)
+    return {'min': min(times), 'median': statistics.median(times)}
+
+
+class CheckError(Exception):
+
+    """Raised when gen's output on a corpus fails a check."""
+
+    pass
+
+
+def check(name, lang, text):
+    """Raise CheckError unless lang's output on text is stable and the
+    other ways of generating it agree.
+
+    """
+
+    import io
+    out = lang.gen(text)
+    if lang.gen(out) != out:
+        raise CheckError('{}: generating again changes the output'.format(
+            name))
+    if lang.analyse(text).text != out:
+        raise CheckError('{}: the incremental output differs'.format(name))
+    f = io.StringIO()
+    lang.genStream(io.StringIO(text), f)
+    if f.getvalue() != out:
+        raise CheckError('{}: the streamed output differs'.format(name))
+
+
+def benchmarks(names, scale, cli_files, select=None):
+    """Yield the name, parameters, function and setup function (or None)
+    of each benchmark whose name contains select.
+
+    Corpora are only built and checked for the benchmarks selected.
+    The comments of a corpus are extracted with the parameters asked
+    for, but some languages can only generate a more limited corpus
+    (see corpus.parameters), and the parameters given for the gen and
+    update benchmarks are the ones it was built with.
+
+    """
+
+    def wanted(*names):
+        return select is None or any(select in n for n in names)
+
+    for nm in names:
+        cls = getattr(langs, nm)
+        lang = cls()
+        for scenario, params in sorted(scenarios.items()):
+            params = dict(params, lines=int(params['lines'] * scale))
+            prefix = '{}.{}.'.format(nm, scenario)
+            if wanted(prefix + 'chunkComment', prefix + 'code',
+                      prefix + 'matchComment'):
+                text = corpus.source(cls, generated=False, **params)
+                if wanted(prefix + 'chunkComment'):
+                    yield (prefix + 'chunkComment', params,
+                           lambda lang=lang, text=text:
+                           lang.chunkComment(text), None)
+                if wanted(prefix + 'code'):
+                    yield (prefix + 'code', params,
+                           lambda lang=lang, text=text: lang.code(text),
+                           None)
+
+                # The cost of dispatching each comment to the
+                # generators.
+                if wanted(prefix + 'matchComment'):
+                    comments = lang.comments(text)
+                    yield (prefix + 'matchComment',
+                           dict(params, comments=len(comments)),
+                           lambda lang=lang, comments=comments:
+                           [lang.matchComment(c) for c in comments], None)
+
+            if wanted(prefix + 'gen', prefix + 'update'):
+                built = corpus.parameters(cls, params)
+                text = corpus.source(cls, **params)
+                check(prefix + 'gen', lang, text)
+                if wanted(prefix + 'gen'):
+                    yield (prefix + 'gen', built,
+                           lambda lang=lang, text=text: lang.gen(text),
+                           None)
+
+                # The cost of generating again after a one character
+                # edit, which is made and then undone.
+                if wanted(prefix + 'update'):
+                    analysis = lang.analyse(text)
+                    pos = len(analysis.text) // 2
+                    yield (prefix + 'update', built,
+                           lambda analysis=analysis, pos=pos:
+                           _edit(analysis, pos), None)
+
+        if wanted(nm + '.pygen.gen'):
+            params = dict(scenarios['small'], pygens=50)
+            text = corpus.source(cls, **params)
+            check(nm + '.pygen.gen', lang, text)
+            yield (nm + '.pygen.gen', corpus.parameters(cls, params),
+                   lambda lang=lang, text=text:
+                   pygen._functions.clear() or lang.gen(text), None)
+
+    if wanted('cli'):
+        params = dict(scenarios['small'], files=cli_files)
+        tmp = tempfile.mkdtemp()
+        try:
+            sources = _cliCorpus(tmp, params)
+            yield ('cli', params, lambda: _cli(tmp),
+                   lambda: _restore(sources))
+        finally:
+            shutil.rmtree(tmp)
+
+
+def _edit(analysis, pos):
+    """Insert a character at pos in analysis' text and then remove it.
+
+    """
+
+    analysis.update([(pos, pos, 'x')])
+    analysis.update([(pos, pos + 1, '')])
+
+
+def _cliCorpus(directory, params):
+    """Write the corpus of the command line benchmark to directory and
+    return a dictionary of each file name and its text.
+
+    """
+
+    p = dict(params)
+    sources = {}
+    for fname in corpus.write(directory, p.pop('files'), **p):
+        with open(fname) as f:
+            sources[fname] = f.read()
+    return sources
+
+
+def _restore(sources):
+    """Write back the text of each file in sources, as _cliCorpus
+    returned it.
+
+    """
+
+    for fname, text in sources.items():
+        with open(fname, 'w') as f:
+            f.write(text)
+
+
+def _cli(directory):
+    """Run the command line interface on the corpus in directory."""
+
+    subprocess.check_call([sys.executable, '-m', 'txt2boil', '-i',
+                           directory], stderr=subprocess.DEVNULL)
+
+
+def run(names, repeat, scale, cli_files, select=None):
+    """Run the benchmarks and return their results."""
+
+    results = {}
+    for name, params, func, setup in benchmarks(names, scale, cli_files,
+                                                select):
+        results[name] = dict(timeit(func, repeat, setup), params=params)
+        sys.stderr.write('{:<40} {:10.6f}\n'.format(name,
+                                                    results[name]['min']))
+    return {'meta': {'txt2boil': txt2boil.__version__,
+                     'python': platform.python_version(),
+                     'platform': platform.platform(),
+                     'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                     'repeat': repeat, 'scale': scale},
+            'results': results}
+
+
+def compare(old, new):
+    """Write a table comparing the minimum times of two runs."""
+
+    sys.stdout.write('{:<40} {:>10} {:>10} {:>7}\n'.format(
+        'benchmark', 'old', 'new', 'ratio'))
+    for name in sorted(set(old['results']) | set(new['results'])):
+        a = old['results'].get(name, {}).get('min')
+        b = new['results'].get(name, {}).get('min')
+        if a is None or b is None:
+            sys.stdout.write('{:<40} {:>10} {:>10}\n'.format(
+                name, 'missing' if a is None else '{:.6f}'.format(a),
+                'missing' if b is None else '{:.6f}'.format(b)))
+            continue
+        sys.stdout.write('{:<40} {:10.6f} {:10.6f} {:7.2f}\n'.format(
+            name, a, b, b / a if a else float('inf')))
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(prog='python -m bench.run',
+                                     description=__doc__.split('\n')[0])
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help='write the results to FILE as JSON')
+    parser.add_argument('--lang', action='append', choices=langs.__all__,
+                        help='only time this language (can be repeated)')
+    parser.add_argument('-k', metavar='TEXT', dest='select',
+                        help='only run benchmarks whose name contains TEXT')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='the number of times to run each benchmark')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiply the number of lines in each corpus')
+    parser.add_argument('--cli-files', type=int, default=20,
+                        help='the number of files of each language for '
+                        'the command line benchmark')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='compare two saved runs instead')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            old = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        compare(old, new)
+        return
+
+    # Don't let the Python Gen disk cache carry over between runs.
+    pygen.cacheDir = None
+    try:
+        results = run(args.lang or langs.__all__, args.repeat, args.scale,
+                      args.cli_files, args.select)
+    except CheckError as err:
+        sys.exit('bench: {}'.format(err))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+from unittest import TestCase
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+from txt2boil import aio
+from txt2boil import batch
+
+
+class AsyncTester(TestCase):
+
+    """Test the asyncio API.
+
+    """
+
+    src = '# Line Gen:\n# a(\\d)\n# b\\1\n\na1\n'
+    out = '# Line Gen:\n# a(\\d)\n# b\\1\nb1\n\na1\n'
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.executor = ThreadPoolExecutor(4)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        shutil.rmtree(self.dir)
+
+    def testGen(self):
+        """Test that gen runs in the executor and raises its errors.
+
+        """
+
+        runner = aio.Runner(self.executor)
+
+        async def main():
+            self.assertEqual(await runner.gen(self.src, name='a.py'),
+                             self.out)
+            with self.assertRaises(ZeroDivisionError):
+                await runner.gen('# Python Gen:\n# 1/0\n', 'py')
+        asyncio.run(main())
+
+    def testProcessMany(self):
+        """Test that processMany yields every file in order.
+
+        """
+
+        fnames = []
+        for i in range(10):
+            fnames.append(os.path.join(self.dir, 'f{}.py'.format(i)))
+            with open(fnames[-1], 'w') as f:
+                f.write(self.src)
+        runner = aio.Runner(self.executor, limit=2)
+
+        async def main():
+            return [r async for r in runner.processMany(fnames, write=True)]
+        results = asyncio.run(main())
+        self.assertEqual([(r.name, r.changed) for r in results],
+                         [(f, True) for f in fnames])
+        with open(fnames[-1]) as f:
+            self.assertEqual(f.read(), self.out)
+
+    def testLimit(self):
+        """Test that no more than limit sources are worked on at once and
+        that cancelled calls never start.
+
+        """
+
+        runner = aio.Runner(self.executor, limit=1)
+        started = []
+        release = threading.Event()
+        process = batch._process
+
+        def slow(job):
+            started.append(job[0])
+            release.wait(5)
+            return process(job)
+
+        async def main():
+            first = asyncio.ensure_future(runner.gen(self.src, 'py', 'a'))
+            second = asyncio.ensure_future(runner.gen(self.src, 'py', 'b'))
+            await asyncio.sleep(0.05)
+            self.assertEqual(started, ['a'])
+            second.cancel()
+            release.set()
+            self.assertEqual(await first, self.out)
+            with self.assertRaises(asyncio.CancelledError):
+                await second
+
+        batch._process = slow
+        try:
+            asyncio.run(main())
+        finally:
+            batch._process = process
+        self.assertEqual(started, ['a'])
+
+    def testTracedThreads(self):
+        """Test that the phases of a thread are only seen by its hooks.
+
+        """
+
+        from txt2boil.core import instrument
+        events = []
+        hook = lambda *event: events.append(event)
+        instrument.addHook(hook)
+        try:
+            runner = aio.Runner(self.executor)
+            r = asyncio.run(runner.process(('a.py', self.src),
+                                           traced=True))
+        finally:
+            instrument.removeHook(hook)
+        self.assertIn('render', r.timings)
+        self.assertEqual(events, [])
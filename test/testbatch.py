@@ -0,0 +1,114 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from unittest import TestCase
+import io
+import os
+import shutil
+import tempfile
+import txt2boil
+from txt2boil import batch
+from txt2boil.cache import ResultCache
+
+
+class BatchTester(TestCase):
+
+    """Test processMany.
+
+    """
+
+    src = '# Line Gen:\n# a(\\d)\n# b\\1\n\na1\n'
+    out = '# Line Gen:\n# a(\\d)\n# b\\1\nb1\n\na1\n'
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.fname = os.path.join(self.dir, 'a.py')
+        with open(self.fname, 'w') as f:
+            f.write(self.src)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def testSources(self):
+        """Test every kind of source processMany accepts.
+
+        """
+
+        buf = io.StringIO(self.out)
+        buf.name = 'c.py'
+        missing = os.path.join(self.dir, 'missing.py')
+        results = list(txt2boil.processMany(
+            [self.fname, ('b.py', self.src), buf, missing], write=True,
+            traced=True))
+        self.assertEqual([r.name for r in results],
+                         [self.fname, 'b.py', 'c.py', missing])
+        self.assertEqual([r.output for r in results],
+                         [self.out, self.out, self.out, None])
+        self.assertEqual([r.changed for r in results],
+                         [True, True, False, False])
+        self.assertIsInstance(results[3].error, EnvironmentError)
+        self.assertIn('read', results[0].timings)
+        self.assertIn('write', results[0].timings)
+        with open(self.fname) as f:
+            self.assertEqual(f.read(), self.out)
+
+    def testEncoding(self):
+        """Test that files are read and written with the encoding.
+
+        """
+
+        with open(self.fname, 'w', encoding='latin-1') as f:
+            f.write(self.src + 'caf\xe9\n')
+        r = next(batch.processMany([self.fname], write=True,
+                                   encoding='latin-1'))
+        self.assertEqual(r.output, self.out + 'caf\xe9\n')
+        with open(self.fname, encoding='latin-1') as f:
+            self.assertEqual(f.read(), r.output)
+
+    def testJobs(self):
+        """Test that the results keep their order across processes.
+
+        """
+
+        sources = [('f{}.py'.format(i), self.src) for i in range(20)]
+        results = batch.processMany(sources, jobs=2)
+        self.assertEqual([(r.name, r.output) for r in results],
+                         [(nm, self.out) for (nm, _) in sources])
+
+    def testShared(self):
+        """Test that one instance of each language is shared.
+
+        """
+
+        list(batch.processMany([('a.py', ''), ('b.py', '')]))
+        self.assertIs(batch._language('a.py', 'auto'),
+                      batch._language('c.py', 'auto'))
+
+    def testCachePrune(self):
+        """Test that the cache is pruned, counting what workers wrote.
+
+        """
+
+        cache = ResultCache(os.path.join(self.dir, 'cache'), len(self.out))
+        sources = [('{}.py'.format(i), self.src + '#{}\n'.format(i))
+                   for i in range(4)]
+        for r in batch.processMany(sources, jobs=2, cache=cache):
+            self.assertIsNone(r.error)
+        entries = [e for d, _, es in os.walk(cache.directory)
+                   for e in es if not e.startswith('.')]
+        self.assertEqual(len(entries), 0)
@@ -0,0 +1,97 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from unittest import TestCase
+import io
+from bench import corpus
+from bench import run
+from txt2boil import langs
+
+
+class CorpusTester(TestCase):
+
+    """Test that the benchmark corpus exercises every language.
+
+    """
+
+    def testSource(self):
+        """Test that the corpora are reproducible and generate.
+
+        """
+
+        for nm in langs.__all__:
+            cls = getattr(langs, nm)
+            lang = cls()
+            text = corpus.source(cls, lines=100, markers=3, triggers=12,
+                                 pygens=1)
+            self.assertEqual(text, corpus.source(cls, lines=100, markers=3,
+                                                 triggers=12, pygens=1))
+            self.assertIn('define(t0_', lang.gen(text), nm)
+            run.check(nm, lang, text)
+
+    def testParameters(self):
+        """Test that languages without line comments only get their
+        requested comments when they aren't generated.
+
+        """
+
+        params = dict(lines=100, density=0.5, blocks=7, markers=3)
+        text = corpus.source(langs.C, generated=False, **params)
+        self.assertGreater(text.count('/*'), 7 + 3)
+        self.assertEqual(corpus.parameters(langs.C, params, False), params)
+        self.assertEqual(corpus.parameters(langs.C, params),
+                         dict(lines=100, density=0, blocks=0, markers=1,
+                              pygens=0))
+        self.assertEqual(corpus.source(langs.C, **params).count('/*'), 1)
+
+    def testSelect(self):
+        """Test that only the selected benchmarks are built.
+
+        """
+
+        names = [b[0] for b in run.benchmarks(['C', 'Python'], 0.01, 1,
+                                              'C.small.')]
+        self.assertEqual(names, ['C.small.chunkComment', 'C.small.code',
+                                 'C.small.matchComment', 'C.small.gen',
+                                 'C.small.update'])
+
+    def testStream(self):
+        """Test that genStream agrees with gen on the corpora.
+
+        """
+
+        for nm in langs.__all__:
+            cls = getattr(langs, nm)
+            if corpus.syntax(cls)[0] is None:
+                continue
+            lang = cls()
+            for seed in range(3):
+                text = corpus.source(cls, lines=200, markers=4,
+                                     triggers=12, seed=seed)
+                out = io.StringIO()
+                lang.genStream(io.StringIO(text), out)
+                self.assertEqual(out.getvalue(), lang.gen(text), nm)
+
+    def testCheck(self):
+        """Test that the benchmarks refuse output that isn't stable.
+
+        """
+
+        text = '# Python Gen:\n# return str(len(env))\n\n' * 2
+        with self.assertRaises(run.CheckError):
+            run.check('unstable', langs.Python(), text)
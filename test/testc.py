@@ -0,0 +1,64 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+from .testgen import TestGen
+from txt2boil.core import GenError
+from txt2boil.langs import C
+
+
+class CTester(TestGen, C):
+
+    """Test the boilerplate generation in C code.
+
+    """
+
+    basicTest = r"""
+/* Line Gen:
+g(\d+)
+\g<0> = \1;
+*/
+
+int a = g5;
+"""
+
+    basicAnswer = r"""
+/* Line Gen:
+g(\d+)
+\g<0> = \1;
+*/g5 = 5;
+
+int a = g5;
+"""
+
+    def testBasic(self):
+        """Test that the output follows the comment's closing delimiter.
+
+        """
+
+        self.checkGenerates(self.basicTest, self.basicAnswer)
+
+    def testSplitChunk(self):
+        """Test that block comments separated by code aren't taken as one
+        marker, whose region would overwrite the code between them.
+
+        """
+
+        text = ('/* Line Gen:\ng(\\d+)\n\\g<0> = \\1\n*/\nint a;\n'
+                '/* other */\nint b;\n\ng5\n')
+        with self.assertRaises(GenError) as cm:
+            self.gen(text)
+        self.assertEqual(cm.exception.line, 1)
@@ -0,0 +1,92 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from unittest import TestCase
+import os
+import shutil
+import tempfile
+from txt2boil.cache import ResultCache
+from txt2boil.langs import Racket, Python
+
+
+class ResultCacheTester(TestCase):
+
+    """Test the persistent cache of generated outputs.
+
+    """
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def testKey(self):
+        """Test that keys depend on the language and the input.
+
+        """
+
+        cache = ResultCache(self.dir)
+        self.assertEqual(cache.key(Racket, 'a'), cache.key(Racket, 'a'))
+        self.assertNotEqual(cache.key(Racket, 'a'), cache.key(Racket, 'b'))
+        self.assertNotEqual(cache.key(Racket, 'a'), cache.key(Python, 'a'))
+
+    def testRoundTrip(self):
+        """Test that a stored result is read back.
+
+        """
+
+        cache = ResultCache(self.dir)
+        key = cache.key(Racket, 'input')
+        self.assertIsNone(cache.get(key))
+        cache.put(key, 'output')
+        self.assertEqual(ResultCache(self.dir).get(key), 'output')
+
+    def testPrune(self):
+        """Test that the least recently used results are pruned.
+
+        """
+
+        cache = ResultCache(self.dir, 25)
+        keys = [cache.key(Racket, str(i)) for i in range(4)]
+        for i, key in enumerate(keys):
+            cache.put(key, 'x' * 10)
+            os.utime(cache._path(key), (i, i))
+        cache.get(keys[0])
+        cache.prune()
+        self.assertEqual([cache.get(k) is not None for k in keys],
+                         [True, False, False, True])
+
+    def testPruneTotal(self):
+        """Test that the entries are only looked at once the running total
+        is over the limit.
+
+        """
+
+        cache = ResultCache(self.dir, 100)
+        cache.put(cache.key(Racket, 'a'), 'x' * 10)
+        cache.prune()
+        big = cache.key(Racket, 'big')
+        cache.put(big, 'x' * 200)
+        cache._written = 0
+        cache.prune()
+        self.assertIsNotNone(cache.get(big))
+        os.utime(cache._path(big), (0, 0))
+        cache.put(cache.key(Racket, 'b'), 'x' * 95)
+        cache.prune()
+        self.assertIsNone(cache.get(big))
@@ -0,0 +1,89 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from unittest import TestCase
+from txt2boil import cmi
+
+
+class Base(object):
+
+    def find(self, calls):
+        calls.append('Base')
+        return 'base'
+
+    def low(self):
+        return 5
+
+
+class A(Base):
+
+    @cmi.nonNoneCMI(lambda: A)
+    def find(self, calls):
+        calls.append('A')
+
+    @cmi.minCMI(lambda: A)
+    def low(self):
+        return 3
+
+
+class B(Base):
+
+    @cmi.nonNoneCMI(lambda: B)
+    def find(self, calls):
+        calls.append('B')
+        return 'b'
+
+    @cmi.AbstractCMI(lambda: B, lambda x, y: x + y)
+    def low(self):
+        return 4
+
+
+class C(A, B):
+
+    def find(self, calls):
+        calls.append('C')
+        return super(C, self).find(calls)
+
+
+class CMITester(TestCase):
+
+    """Test the chains of responsibility built by the CMI descriptors.
+
+    """
+
+    def testShortCircuit(self):
+        """Test that a chain stops at the first answer.
+
+        """
+
+        calls = []
+        self.assertEqual(C().find(calls), 'b')
+        self.assertEqual(calls, ['C', 'A', 'B'])
+
+        calls = []
+        self.assertEqual(A().find(calls), 'base')
+        self.assertEqual(calls, ['A', 'Base'])
+
+    def testMerge(self):
+        """Test that the answers of a chain are merged.
+
+        """
+
+        self.assertEqual(C().low(), 3)
+        self.assertEqual(B().low(), 9)
+        self.assertEqual(C().low(), 3)
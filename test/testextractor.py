@@ -0,0 +1,120 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from unittest import TestCase
+from txt2boil.core import CodeView
+from txt2boil.langs import CXX
+
+
+class CXXExtractorTester(CXX, TestCase):
+
+    """Test the comment tokenizer on C++ code.
+
+    """
+
+    text = r"""
+// foo
+// bar
+int x;
+/* baz */ /* qux */
+
+/* a
+// b
+*/
+
+
+"""
+
+    def naivePieces(self, text, start):
+        """Find the comments in text by calling nextComment over and over
+        again.
+
+        """
+
+        comm, out = self.nextComment(text, start), []
+        while comm:
+            out.append(comm.group(0))
+            comm = self.nextComment(text, comm.start(0) + 1)
+        return out
+
+    def testChunks(self):
+        """Test that every kind of comment is chunked in order.
+
+        """
+
+        self.assertEqual(self.chunkComment(self.text),
+                         [['// foo\n', '// bar\n'],
+                          ['/* baz */', '/* qux */', ''],
+                          ['/* a\n// b\n*/'],
+                          ['// b\n'],
+                          ['', '']])
+
+    def testPieces(self):
+        """Test that the chunks are made of the pieces nextComment finds.
+
+        """
+
+        for start in range(len(self.text)):
+            pieces = [p for c in self.chunkComment(self.text, start)
+                      for p in c if p]
+            naive = [p for p in self.naivePieces(self.text, start) if p]
+            self.assertEqual(pieces, naive)
+
+    def testCode(self):
+        """Test that every comment is stripped from the code.
+
+        """
+
+        self.assertEqual(self.code(self.text), '\nint x;\n \n\n\n\n\n')
+
+    def testCodeView(self):
+        """Test that the stripped code is kept up to date as the source is
+        edited.
+
+        """
+
+        view = CodeView(self, self.text)
+        for (start, end, new) in [(0, 1, '// x\nint y;\n'),
+                                  (12, 12, '/* z */'),
+                                  (30, 50, ''),
+                                  (0, 0, '\n')]:
+            text = view.source[:start] + new + view.source[end:]
+            view.replace(start, end, new)
+            self.assertEqual(view.source, text)
+            self.assertEqual(view.text, self.code(text))
+            for i, c in enumerate(view.text):
+                self.assertEqual(text[view.toSource(i)], c)
+
+    def testCodeViewWindow(self):
+        """Test edits to a long source, including ones that open or close
+        a comment far away from the edit.
+
+        """
+
+        text = 'int a; // x\n' * 500
+        view = CodeView(self, text)
+        for (start, end, new) in [(3000, 3000, '/*'),
+                                  (5000, 5000, '*/'),
+                                  (3000, 3002, ''),
+                                  (100, 101, '"'),
+                                  (100, 101, 'i'),
+                                  (5002, 5003, '')]:
+            text = text[:start] + new + text[end:]
+            view.replace(start, end, new)
+            self.assertEqual(view.source, text)
+            self.assertEqual(view.text, self.code(text))
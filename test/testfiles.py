@@ -0,0 +1,117 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from unittest import TestCase
+from txt2boil import files
+import os
+import shutil
+import stat
+import tempfile
+
+
+class FilesTester(TestCase):
+
+    """Test finding and rewriting source files.
+
+    """
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.fname = os.path.join(self.dir, 'a.py')
+        with open(self.fname, 'w') as f:
+            f.write('a\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def read(self, fname):
+        with open(fname) as f:
+            return f.read()
+
+    def testReplaceMode(self):
+        """Test that a replaced file keeps its permission bits.
+
+        """
+
+        os.chmod(self.fname, 0o751)
+        files.replace(self.fname, 'b\n')
+        self.assertEqual(self.read(self.fname), 'b\n')
+        self.assertEqual(stat.S_IMODE(os.stat(self.fname).st_mode), 0o751)
+
+    def testReplaceLinks(self):
+        """Test that symbolic and hard links still lead to the replaced
+        file.
+
+        """
+
+        sym = os.path.join(self.dir, 'sym.py')
+        hard = os.path.join(self.dir, 'hard.py')
+        os.symlink(self.fname, sym)
+        files.replace(sym, 'b\n')
+        self.assertTrue(os.path.islink(sym))
+        self.assertEqual(self.read(self.fname), 'b\n')
+
+        os.link(self.fname, hard)
+        files.replace(hard, 'c\n')
+        self.assertTrue(os.path.samefile(self.fname, hard))
+        self.assertEqual(self.read(self.fname), 'c\n')
+        with files.mapped(hard) as data:
+            files.splice(hard, data, [(0, 1, 'longer')])
+        self.assertEqual(self.read(self.fname), 'longer\n')
+        self.assertEqual(sorted(os.listdir(self.dir)),
+                         ['a.py', 'hard.py', 'sym.py'])
+
+    def testWalkLoop(self):
+        """Test that a symbolic link back up the tree isn't followed
+        forever.
+
+        """
+
+        sub = os.path.join(self.dir, 'sub')
+        os.mkdir(sub)
+        os.symlink(self.dir, os.path.join(sub, 'loop'))
+        with open(os.path.join(sub, 'b.py'), 'w') as f:
+            f.write('b\n')
+        self.assertEqual(list(files.walk(self.dir, {'.py'})),
+                         [self.fname, os.path.join(sub, 'b.py')])
+
+    def testContainsBom(self):
+        """Test finding words in files whose encoding writes a byte order
+        mark.
+
+        """
+
+        for enc in ['utf-8-sig', 'utf-16', 'utf-32']:
+            with open(self.fname, 'w', encoding=enc) as f:
+                f.write('# Line Gen:\n')
+            self.assertTrue(files.contains(self.fname, ['Line Gen:'], enc))
+            self.assertFalse(files.contains(self.fname, ['Python Gen:'],
+                                            enc))
+        with open(self.fname, 'w', encoding='utf-16-be') as f:
+            f.write('# Line Gen:\n')
+        self.assertTrue(files.contains(self.fname, ['Line Gen:'], 'utf-16'))
+
+    def testDecodeBom(self):
+        """Test that text to be written with a byte order mark isn't
+        spliced.
+
+        """
+
+        with files.mapped(self.fname) as data:
+            self.assertEqual(files.decode(data, 'utf-8-sig'), ('a\n', False))
+            self.assertEqual(files.decode(data, 'utf-8'), ('a\n', True))
@@ -0,0 +1,74 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from unittest import TestCase
+import subprocess
+import sys
+import txt2boil
+from txt2boil import langs
+
+
+class ImportTester(TestCase):
+
+    """Keep starting the command line interface cheap.
+
+    """
+
+    # The most time, in seconds, that importing txt2boil.__main__ may
+    # take, and the modules it must not import.
+    budget = 0.1
+    lazy = ['txt2boil.langs', 'txt2boil.core', 'txt2boil.pygen',
+            'multiprocessing', 'tempfile', 'textwrap', 'hashlib']
+
+    def testLangMapping(self):
+        """Test that the static extension table matches the classes.
+
+        """
+
+        mapping = {ext: nm for nm in langs.__all__
+                   for ext in getattr(langs, nm).ext}
+        self.assertEqual(txt2boil._langmapping, mapping)
+
+    def testLazy(self):
+        """Test that the heavy modules aren't imported at startup.
+
+        """
+
+        code = ('import sys, txt2boil.__main__\n'
+                'print(" ".join(sorted(sys.modules)))')
+        out = subprocess.check_output([sys.executable, '-c', code])
+        modules = out.decode().split()
+        for m in self.lazy:
+            self.assertNotIn(m, modules)
+
+    def testBudget(self):
+        """Test that importing the command line stays within budget.
+
+        """
+
+        p = subprocess.Popen([sys.executable, '-X', 'importtime', '-c',
+                              'import txt2boil.__main__'],
+                             stderr=subprocess.PIPE)
+        _, err = p.communicate()
+        for line in err.decode().splitlines():
+            fields = [f.strip() for f in line.split('|')]
+            if fields[-1] == 'txt2boil.__main__':
+                self.assertLess(int(fields[1]) / 1e6, self.budget)
+                break
+        else:
+            self.fail('txt2boil.__main__ was not imported')
@@ -0,0 +1,155 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+from unittest import TestCase
+import io
+import random
+import re
+from bench import corpus
+from txt2boil import langs
+
+
+class IncrementalTester(TestCase):
+
+    """Test that an Analysis generates what gen does as it is edited.
+
+    """
+
+    def edits(self, rnd, text):
+        """Return some random edits of text."""
+
+        out = []
+        pos = 0
+        for _ in range(rnd.randint(1, 3)):
+            if pos >= len(text):
+                break
+            start = rnd.randint(pos, min(len(text), pos + len(text) // 2))
+            end = min(len(text), start + rnd.choice([0, 1, 10, 40]))
+            new = rnd.choice(['', '\n', '\n\n', 'x', 't0_7 ', 'use(t1_3)\n',
+                              text[rnd.randrange(len(text)):][:20]])
+            out.append((start, end, new))
+            pos = end + 1
+        return out
+
+    def testUpdate(self):
+        """Test that random edits update as gen generates.
+
+        """
+
+        for nm in langs.__all__:
+            lang = getattr(langs, nm)()
+            for seed in range(20):
+                rnd = random.Random(seed)
+                text = corpus.source(type(lang), lines=60, markers=4,
+                                     triggers=8, seed=seed)
+                analysis = lang.analyse(text)
+                msg = '{} seed {}'.format(nm, seed)
+                self.assertEqual(analysis.text, lang.gen(text), msg)
+                for _ in range(20):
+                    edits = self.edits(rnd, analysis.text)
+                    text = analysis.text
+                    for start, end, new in reversed(edits):
+                        text = text[:start] + new + text[end:]
+                    try:
+                        expected = lang.gen(text)
+                    except Exception:
+                        # The markers of every segment are found before
+                        # any is rendered, so the error may be another.
+                        with self.assertRaises(Exception):
+                            analysis.update(edits)
+                        self.assertEqual(analysis.text, text)
+                        continue
+                    out = analysis.update(edits)
+                    self.assertEqual(analysis.text, expected, msg)
+                    for start, end, new in reversed(out):
+                        text = text[:start] + new + text[end:]
+                    self.assertEqual(text, expected, msg)
+
+    def testCrossing(self):
+        """Test comments that cross into or out of a generated region.
+
+        """
+
+        lang = langs.CXX()
+
+        # The old region of the second marker opens a comment that
+        # hides g1 from the first.
+        text = ('// Line Gen:\n// g(\\d)\n// \\g<0>;\n\n'
+                '// Line Gen:\n// h(\\d)\n// \\g<0>;\n/* open\n\n'
+                'g1\n*/ g2\n')
+        expected = lang.gen(text)
+        self.assertIn('\ng2;\n\n', expected)
+        self.assertEqual(lang.analyse(text).text, expected)
+        out = io.StringIO()
+        lang.genStream(io.StringIO(text), out)
+        self.assertEqual(out.getvalue(), expected)
+
+        # The new region of the first marker opens a comment that hides
+        # g2 from the second.
+        text = ('// Line Gen:\n// g(\\d)\n// \\g<0> /* x\n\ng1\n\n'
+                '// Line Gen:\n// g(\\d)\n// \\g<0>;\n\ng2 */ g3\n')
+        expected = lang.gen(text)
+        self.assertIn('\ng1;\ng3;\n', expected)
+        analysis = lang.analyse(text)
+        self.assertEqual(analysis.text, expected)
+        pos = len(analysis.text)
+        analysis.update([(pos, pos, 'g4\n')])
+        self.assertEqual(analysis.text, lang.gen(expected + 'g4\n'))
+
+    def testOpened(self):
+        """Test an edit that opens a comment closed segments later.
+
+        """
+
+        lang = langs.CXX()
+        text = ('// Line Gen:\n// g(\\d)\n// \\g<0>;\n\ng1\n\nx\n\ny\n\n'
+                'g2\n\nz */\n')
+        analysis = lang.analyse(text)
+        self.assertIn('\ng1;\ng2;\n', analysis.text)
+        pos = analysis.text.index('g1\n\nx')
+        analysis.update([(pos, pos, '/* ')])
+        expected = lang.gen(text.replace('g1\n\nx', '/* g1\n\nx'))
+        self.assertNotIn('g2;', expected)
+        self.assertEqual(analysis.text, expected)
+
+    def testPythonGen(self):
+        """Test that Python Gen output follows the edits.
+
+        """
+
+        lang = langs.Python()
+        text = '# Python Gen:\n# return str(env.count("x"))\n\nx\n'
+        analysis = lang.analyse(text)
+        self.assertEqual(analysis.text, lang.gen(text))
+        pos = len(analysis.text)
+        analysis.update([(pos, pos, 'x\n')])
+        self.assertEqual(analysis.text, lang.gen(text + 'x\n'))
+
+    def testError(self):
+        """Test that an update that fails leaves the text as edited.
+
+        """
+
+        lang = langs.Python()
+        analysis = lang.analyse('')
+        with self.assertRaises(re.error):
+            analysis.update([(0, 0, '# Line Gen:\n# a(\\d)\n# \\2\n\na1\n')])
+        analysis.update([(23, 24, '1')])
+        self.assertEqual(analysis.text,
+                         '# Line Gen:\n# a(\\d)\n# \\1\n1\n\na1\n')
@@ -0,0 +1,264 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from unittest import TestCase
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+from txt2boil.__main__ import main
+
+
+class MainTester(TestCase):
+
+    """Test the command line interface.
+
+    """
+
+    src = r"""
+;; Constant Gen: r(\d+)/(\d+) (make-my-rational \1 \2)
+
+r{}/7
+"""
+
+    out = r"""
+;; Constant Gen: r(\d+)/(\d+) (make-my-rational \1 \2)
+(define r{0}/7 (make-my-rational {0} 7))
+
+r{0}/7
+"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.files = []
+        for i in range(8):
+            fname = os.path.join(self.dir, 'f{}.rkt'.format(i))
+            with open(fname, 'w') as f:
+                f.write(self.src.format(i))
+            self.files.append(fname)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def run_main(self, *argv):
+        """Run main with argv and return its exit status, stdout and
+        stderr.
+
+        """
+
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = io.StringIO(), io.StringIO()
+        try:
+            try:
+                main(list(argv))
+                status = 0
+            except SystemExit as e:
+                status = e.code
+            return status, sys.stdout.getvalue(), sys.stderr.getvalue()
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+
+    def testJobs(self):
+        """Test that --jobs keeps the output in the order of the files.
+
+        """
+
+        expected = ''.join(self.out.format(i) for i in range(8))
+        self.assertEqual(self.run_main(*self.files), (0, expected, ''))
+        self.assertEqual(self.run_main('-j', '3', *self.files),
+                         (0, expected, ''))
+
+    def testErrors(self):
+        """Test that an error is reported for its file only.
+
+        """
+
+        missing = os.path.join(self.dir, 'missing.rkt')
+        status, out, err = self.run_main('-j', '2', self.files[0], missing,
+                                         self.files[1])
+        self.assertEqual(status, 1)
+        self.assertEqual(out, self.out.format(0) + self.out.format(1))
+        self.assertTrue(err.startswith(missing + ': '))
+
+        status, _, err = self.run_main('--pygen-timeout', '1', self.files[0])
+        self.assertEqual(status, 2)
+        self.assertIn('--pygen-timeout requires --pygen-jobs', err)
+
+    def testInPlace(self):
+        """Test that only changed files are rewritten, keeping their
+        permissions.
+
+        """
+
+        os.chmod(self.files[0], 0o640)
+        self.assertEqual(self.run_main('-i', *self.files[:2]),
+                         (0, '', '2 of 2 files changed\n'))
+        self.assertEqual(os.stat(self.files[0]).st_mode & 0o777, 0o640)
+        with open(self.files[0]) as f:
+            self.assertEqual(f.read(), self.out.format(0))
+
+        os.utime(self.files[0], (0, 0))
+        self.assertEqual(self.run_main('-i', *self.files[:2]),
+                         (0, '', '0 of 2 files changed\n'))
+        self.assertEqual(os.stat(self.files[0]).st_mtime, 0)
+        self.assertEqual(sorted(os.listdir(self.dir)),
+                         sorted(os.path.basename(f) for f in self.files))
+
+    def testEncoding(self):
+        """Test that --encoding is used to read and write files.
+
+        """
+
+        src = self.src.format(0).replace('\n\n', '\n; caf\xe9\n\n', 1)
+        with open(self.files[0], 'w', encoding='latin-1') as f:
+            f.write(src)
+        self.assertEqual(self.run_main('-i', '--encoding', 'latin-1',
+                                       self.files[0]),
+                         (0, '', '1 of 1 files changed\n'))
+        with open(self.files[0], encoding='latin-1') as f:
+            self.assertEqual(f.read(), self.out.format(0).replace(
+                '\n(define', '\n; caf\xe9\n(define', 1))
+
+    def testCheck(self):
+        """Test that --check and --diff report out of date files without
+        writing them.
+
+        """
+
+        with open(self.files[1], 'w') as f:
+            f.write(self.out.format(1))
+        self.assertEqual(self.run_main('--check', '-j', '2',
+                                       *self.files[:2]),
+                         (1, self.files[0] + ':3: out of date\n',
+                          '1 of 2 files out of date\n'))
+        status, out, err = self.run_main('--diff', *self.files[:2])
+        self.assertEqual(status, 1)
+        self.assertIn('+(define r0/7 (make-my-rational 0 7))\n', out)
+        with open(self.files[0]) as f:
+            self.assertEqual(f.read(), self.src.format(0))
+
+        self.run_main('-i', self.files[0])
+        cache = os.path.join(self.dir, 'cache')
+        for _ in range(2):
+            self.assertEqual(self.run_main('--check', '--cache-dir', cache,
+                                           *self.files[:2]),
+                             (0, '', '0 of 2 files out of date\n'))
+
+    def testCache(self):
+        """Test that --cache-dir reuses the outputs of earlier runs.
+
+        """
+
+        cache = os.path.join(self.dir, 'cache')
+        expected = ''.join(self.out.format(i) for i in range(2))
+        self.assertEqual(self.run_main('--cache-dir', cache,
+                                       *self.files[:2]),
+                         (0, expected, ''))
+        entries = [os.path.join(d, e) for d, _, es in os.walk(cache)
+                   for e in es if not e.startswith('.')]
+        self.assertEqual(len(entries), 2)
+        for path in entries:
+            with open(path, 'a') as f:
+                f.write('cached\n')
+        self.assertEqual(self.run_main('--cache-dir', cache,
+                                       *self.files[:2]),
+                         (0, expected.replace('r1/7\n', 'r1/7\ncached\n')
+                          .replace('r0/7\n', 'r0/7\ncached\n'), ''))
+
+        # The entries written by worker processes are counted too.
+        shutil.rmtree(cache)
+        self.run_main('--cache-dir', cache, self.files[0])
+        self.run_main('-j', '2', '--cache-dir', cache, *self.files)
+        with open(os.path.join(cache, '.total')) as f:
+            total = int(f.read().split()[0])
+        self.assertEqual(total, len(''.join(self.out.format(i)
+                                            for i in range(8))))
+
+    def testTree(self):
+        """Test that directories are searched and --files-from is read.
+
+        """
+
+        sub = os.path.join(self.dir, 'a', 'b')
+        os.makedirs(sub)
+        for name in ['skip.rkt', 'keep.rkt', 'notes.txt']:
+            with open(os.path.join(sub, name), 'w') as f:
+                f.write(self.src.format(9))
+        with open(os.path.join(self.dir, 'a', '.txt2boilignore'), 'w') as f:
+            f.write('# generated\nb/skip.rkt\n')
+        shutil.move(self.files[0], os.path.join(self.dir, 'a'))
+
+        status, out, err = self.run_main(os.path.join(self.dir, 'a'))
+        self.assertEqual((status, err), (0, ''))
+        self.assertEqual(out, self.out.format(0) + self.out.format(9))
+
+        lst = os.path.join(self.dir, 'list')
+        with open(lst, 'w') as f:
+            f.write('\0'.join(self.files[1:3]) + '\0')
+        status, out, err = self.run_main('--files-from', lst)
+        self.assertEqual(out, self.out.format(1) + self.out.format(2))
+
+    def testListMarked(self):
+        """Test that --list-marked only prints the files with markers.
+
+        """
+
+        with open(self.files[1], 'w') as f:
+            f.write('(define x 1)\n')
+        with open(self.files[2], 'w') as f:
+            f.write('(define s "Constant Gen: x y")\n')
+        self.assertEqual(self.run_main('--list-marked', *self.files[:4]),
+                         (0, self.files[0] + '\n' + self.files[3] + '\n',
+                          ''))
+
+    def testStream(self):
+        """Test that --stream prints the files and standard input.
+
+        """
+
+        self.assertEqual(self.run_main('--stream', *self.files[:2]),
+                         (0, self.out.format(0) + self.out.format(1), ''))
+        self.assertEqual(self.run_main('--stream')[0], 2)
+
+        r, w = os.pipe()
+        with os.fdopen(w, 'w') as f:
+            f.write(self.src.format(5))
+        stdin = sys.stdin
+        with os.fdopen(r) as sys.stdin:
+            try:
+                self.assertEqual(self.run_main('--stream', '--lang', 'rkt'),
+                                 (0, self.out.format(5), ''))
+            finally:
+                sys.stdin = stdin
+
+    def testStats(self):
+        """Test that --stats and --trace report the phases of each file.
+
+        """
+
+        trace = os.path.join(self.dir, 'trace.json')
+        status, out, err = self.run_main('--stats', '--trace', trace,
+                                         *self.files[:2])
+        self.assertEqual(status, 0)
+        self.assertIn('slowest files:', err)
+        with open(trace) as f:
+            events = json.load(f)['traceEvents']
+        self.assertEqual(sorted(e['args']['fname'] for e in events
+                                if e['name'] == 'file'), self.files[:2])
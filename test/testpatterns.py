@@ -0,0 +1,79 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from unittest import TestCase
+from txt2boil.core import HookedRegex
+from txt2boil.core import triggers
+from txt2boil.core.patterns import PatternRegistry, analyses, registry
+
+
+class PatternRegistryTester(TestCase):
+
+    """Test the compiled pattern registry.
+
+    """
+
+    def testReuse(self):
+        """Test that a marker regex is only compiled once.
+
+        """
+
+        HookedRegex(r'Line Gen:\n(.+)\n(.+)\n', '{}\n', 'Line Gen:\na\nb\n')
+        before = registry.stats()
+        h = HookedRegex(r'Line Gen:\n(.+)\n(.+)\n', '{}\n',
+                        'Line Gen:\nc\nd\n')
+        after = registry.stats()
+        self.assertEqual(h.match, 'c')
+        self.assertEqual(after['misses'], before['misses'])
+        self.assertEqual(after['hits'], before['hits'] + 1)
+
+    def testNoMatch(self):
+        """Test that HookedRegex is None when the text doesn't match.
+
+        """
+
+        self.assertIsNone(HookedRegex(r'Line Gen:\n(.+)\n(.+)\n', '{}\n',
+                                      'Python Gen:\n'))
+
+    def testEviction(self):
+        """Test that the least recently used pattern is evicted.
+
+        """
+
+        r = PatternRegistry(maxsize=2)
+        a = r.compile('a')
+        r.compile('b')
+        r.compile('a')
+        r.compile('c')
+        self.assertIs(r.compile('a'), a)
+        self.assertEqual(r.stats(), {'size': 2, 'maxsize': 2, 'hits': 2,
+                                     'misses': 3, 'evictions': 1})
+
+    def testSeparate(self):
+        """Test that trigger analyses don't count as compiled patterns.
+
+        """
+
+        before = registry.stats()
+        analyses.get('separate(\\d+)',
+                     lambda: triggers._compile('separate(\\d+)'))
+        after = registry.stats()
+        self.assertEqual(after['misses'], before['misses'] + 1)
+        self.assertEqual(after['size'], before['size'] + 1)
+        self.assertIn('separate(\\d+)', analyses._cache)
+        self.assertIn(('separate(\\d+)', 0), registry._cache)
@@ -17,6 +17,14 @@
 
 from .testgen import TestGen
 from txt2boil.langs import Python
+from txt2boil import cmi
+from txt2boil import pygen
+from txt2boil.core import GenError, HookedRegex
+from txt2boil.core import instrument
+from txt2boil.pygen import PyGenPool, PyGenTimeout
+import os
+import shutil
+import tempfile
 
 
 class PythonTester(Python, TestGen):
@@ -40,3 +48,190 @@ print g9_7
 
     def testBasic(self):
         self.checkGenerates(self.basicTest, self.basicAnswer)
+
+    def testSplitChunk(self):
+        """Test that a marker whose lines are separated by code is
+        rejected instead of having its region overwrite the code.
+
+        """
+
+        text = '\n# Line Gen:\n# g(\\d+)\nx = 1\n# \\g<0> = 1\nold\n\ng5\n'
+        with self.assertRaises(GenError) as cm:
+            self.gen(text)
+        self.assertEqual(cm.exception.line, 2)
+
+    def testMarked(self):
+        """Test that the keywords find the marked texts.
+
+        """
+
+        self.assertEqual(self.keywords(), {'Line Gen:', 'Python Gen:'})
+        self.assertTrue(self.marked(self.basicTest))
+        self.assertFalse(self.mayBeMarked('# Line\n# Gen:\n'))
+        self.assertFalse(self.marked('x = "Line Gen:"\n'))
+
+    def testRoute(self):
+        """Test that comments only go to their keyword's generators.
+
+        """
+
+        self.assertIsNone(self.route('Just a comment\n'))
+        self.assertIsNone(self.route('Not a Line Gen:\na\nb\n'))
+        self.assertEqual(self.route('Line Gen:\na\nb\n').match, 'a')
+
+        # Generators without markers are asked about every comment.
+        class Anywhere(Python):
+            @cmi.nonNoneCMI(lambda: Anywhere)
+            def matchComment(self, comm):
+                return HookedRegex(r'Not a Line (Gen):\n()', '', comm)
+        gen = Anywhere()
+        self.assertIsNone(gen.keywords())
+        self.assertEqual(gen.route('Not a Line Gen:\n').match, 'Gen')
+        self.assertEqual(gen.route('Line Gen:\na\nb\n').match, 'a')
+
+    def testInstrument(self):
+        """Test that the hooks see each phase of gen once.
+
+        """
+
+        events = []
+        hook = lambda *e: events.append(e)
+        instrument.addHook(hook)
+        try:
+            self.gen(self.basicTest)
+        finally:
+            instrument.removeHook(hook)
+        phases = {phase: info for (phase, _, _, info) in events}
+        self.assertEqual(sorted(phases), ['chunk', 'code', 'match',
+                                          'render', 'triggers'])
+        self.assertEqual(phases['triggers']['count'], 1)
+        self.gen(self.basicTest)
+        self.assertEqual(len(events), 5)
+
+    sharedTest = r"""
+# Line Gen:
+# g(\d+)_(\d+)
+# \g<0> = divmod(\1, \2)
+
+# Line Gen:
+# g(\d+)_(\d+)
+# \g<0>_r = \2
+
+print g9_7, g1_2
+"""
+
+    sharedAnswer = r"""
+# Line Gen:
+# g(\d+)_(\d+)
+# \g<0> = divmod(\1, \2)
+g1_2 = divmod(1, 2)
+g9_7 = divmod(9, 7)
+
+# Line Gen:
+# g(\d+)_(\d+)
+# \g<0>_r = \2
+g1_2_r = 2
+g9_7_r = 7
+
+print g9_7, g1_2
+"""
+
+    def testSharedTrigger(self):
+        """Test two markers that share a trigger regex.
+
+        """
+
+        self.checkGenerates(self.sharedTest, self.sharedAnswer)
+
+    def testManyMarkers(self):
+        """Test a file with more markers than the recursion limit.
+
+        """
+
+        def number(text, i):
+            return text.replace('g9', 'g%d_9' % i).replace('g(', 'g%d_(' % i)
+
+        src = ''.join(number(self.basicTest, i) for i in range(2000))
+        out = ''.join(number(self.basicAnswer, i) for i in range(2000))
+        self.checkGenerates(src, out)
+
+    pyGenTest = r"""
+# Python Gen:
+# if env.startswith('#!'):
+#     return 'I am in a unix script'
+# else:
+#     return 'I am an ordinary module'
+
+print 'hello'
+"""
+
+    pyGenAnswer = r"""
+# Python Gen:
+# if env.startswith('#!'):
+#     return 'I am in a unix script'
+# else:
+#     return 'I am an ordinary module'
+I am an ordinary module
+
+print 'hello'
+"""
+
+    def testPyGen(self):
+        """Test that Python Gen bodies are compiled once and cached on disk.
+
+        """
+
+        cache, pygen.cacheDir = pygen.cacheDir, tempfile.mkdtemp()
+        try:
+            self.checkGenerates(self.pyGenTest, self.pyGenAnswer)
+            self.assertEqual(len(os.listdir(pygen.cacheDir)), 1)
+            pygen._functions.clear()
+            self.checkGenerates(self.pyGenTest, self.pyGenAnswer)
+            self.assertEqual(len(pygen._functions), 1)
+        finally:
+            shutil.rmtree(pygen.cacheDir)
+            pygen.cacheDir = cache
+
+    def testPyGenUnsafeCache(self):
+        """Test that a cache directory others can write to isn't used.
+
+        """
+
+        cache, pygen.cacheDir = pygen.cacheDir, tempfile.mkdtemp()
+        try:
+            os.chmod(pygen.cacheDir, 0o777)
+            pygen._functions.clear()
+            self.checkGenerates(self.pyGenTest, self.pyGenAnswer)
+            self.assertEqual(os.listdir(pygen.cacheDir), [])
+        finally:
+            shutil.rmtree(pygen.cacheDir)
+            pygen.cacheDir = cache
+
+    def testPyGenPool(self):
+        """Test running Python Gen code in worker processes.
+
+        """
+
+        with PyGenPool(2, timeout=0.5) as pygen.executor:
+            try:
+                self.checkGenerates(self.pyGenTest, self.pyGenAnswer)
+                loop = '\n# Python Gen:\n# while True:\n#     pass\n'
+                with self.assertRaises(PyGenTimeout) as cm:
+                    self.gen(self.pyGenAnswer + loop)
+                self.assertEqual(cm.exception.line, 11)
+            finally:
+                pygen.executor = None
+
+    def testPyGenPoolQueued(self):
+        """Test that the timeout only counts a snippet's own run time, and
+        that an overrunning snippet that isn't needed is given up on.
+
+        """
+
+        sleep = 'import time\ntime.sleep(0.3)\nreturn env\n'
+        loop = 'while True:\n    pass\n'
+        with PyGenPool(1, timeout=0.5) as pool:
+            pool.submit(sleep, 'a')
+            self.assertEqual(pool.run(sleep, 'b'), 'b')
+            pool.submit(loop, 'c')
+            self.assertEqual(pool.run('return env\n', 'd'), 'd')
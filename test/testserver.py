@@ -0,0 +1,107 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from unittest import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+from txt2boil.server import Server, METHOD_NOT_FOUND, INVALID_PARAMS
+from txt2boil.server import serveSocket
+
+
+class ServerTester(TestCase):
+
+    """Test the JSON-RPC server.
+
+    """
+
+    src = '# Line Gen:\n# g(\\d+)\n# \\g<0> = \\1\n\ng1\n'
+    out = '# Line Gen:\n# g(\\d+)\n# \\g<0> = \\1\ng1 = 1\n\ng1\n'
+
+    def setUp(self):
+        self.server = Server()
+
+    def request(self, method, params, rid=1):
+        return {'jsonrpc': '2.0', 'id': rid, 'method': method,
+                'params': params}
+
+    def testGenerate(self):
+        """Test the generate method's results.
+
+        """
+
+        r = self.server.handle(self.request('generate', {
+            'text': self.src, 'filename': 'foo.py'}))
+        self.assertEqual(r['result']['text'], self.out)
+        self.assertGreaterEqual(r['result']['elapsed_ms'], 0)
+
+        r = self.server.handle(self.request('generate', [self.src, 'py',
+                                                         None, True]))
+        self.assertEqual(r['result']['edits'],
+                         [{'start': 34, 'end': 34, 'startPos': (3, 0),
+                           'endPos': (3, 0), 'text': 'g1 = 1\n'}])
+
+    def testErrors(self):
+        """Test the errors of bad requests and notifications.
+
+        """
+
+        r = self.server.handle(self.request('nope', []))
+        self.assertEqual(r['error']['code'], METHOD_NOT_FOUND)
+        r = self.server.handle(self.request('generate', {'txt': ''}))
+        self.assertEqual(r['error']['code'], INVALID_PARAMS)
+        self.assertIsNone(self.server.handle(
+            {'jsonrpc': '2.0', 'method': 'nope'}))
+
+    def testServe(self):
+        """Test serving requests, batches and shutdown.
+
+        """
+
+        lines = [self.request('generate', [self.src, 'py'], 1),
+                 [self.request('languages', [], 2),
+                  self.request('shutdown', [], 3)],
+                 self.request('languages', [], 4)]
+        rfile = io.StringIO(''.join(json.dumps(l) + '\n' for l in lines))
+        wfile = io.StringIO()
+        self.server.serve(rfile, wfile)
+        out = [json.loads(l) for l in wfile.getvalue().splitlines()]
+        self.assertEqual(len(out), 2)
+        self.assertEqual(out[0]['result']['text'], self.out)
+        self.assertEqual([r['id'] for r in out[1]], [2, 3])
+        self.assertIn('Python', [l['name'] for l in
+                                 out[1][0]['result']['languages']])
+
+    def testSocketPath(self):
+        """Test that a file that isn't a socket is never replaced.
+
+        """
+
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, 'sock')
+            with open(path, 'w') as f:
+                f.write('keep\n')
+            with self.assertRaises(FileExistsError):
+                serveSocket(self.server, path)
+            with open(path) as f:
+                self.assertEqual(f.read(), 'keep\n')
+        finally:
+            shutil.rmtree(tmp)
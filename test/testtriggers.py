@@ -0,0 +1,101 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from unittest import TestCase
+import random
+import re
+from txt2boil.core import CodeView, patterns, triggers
+from txt2boil.core.triggers import TriggerIndex
+from txt2boil.langs import Python
+
+
+class _Broken(object):
+
+    """A stand in for an re parser that can't parse anything.
+
+    """
+
+    def parse(self, rgx):
+        raise TypeError('unexpected parser output')
+
+
+class TriggersTester(TestCase):
+
+    """Test the trigger index.
+
+    """
+
+    def setUp(self):
+        self.analyses = patterns.analyses
+        patterns.analyses = patterns.PatternRegistry()
+
+    def tearDown(self):
+        patterns.analyses = self.analyses
+        triggers.sre_parse = triggers._C
+
+    def testAnalyse(self):
+        """Test that line bounded regexes and plain strings are found.
+
+        """
+
+        self.assertEqual(triggers._compile(r'g\d+')[1:], (True, None))
+        self.assertEqual(triggers._compile(r'g\s+')[1:], (False, None))
+        self.assertEqual(triggers._compile('foo')[1:], (True, 'foo'))
+
+    def testFallback(self):
+        """Test that a parser failure falls back to full rescans.
+
+        """
+
+        triggers.sre_parse = _Broken()
+        self.assertEqual(triggers._compile('foo')[1:], (False, None))
+
+        view = CodeView(Python(), 'g1\n# g2\ng3\n')
+        index = TriggerIndex(view)
+        self.assertEqual(sorted(index.collect(r'g\d')), ['g1', 'g3'])
+        view.replace(8, 8, 'g4 ')
+        self.assertEqual(sorted(index.collect(r'g\d')), ['g1', 'g3', 'g4'])
+
+    def testTable(self):
+        """Test that the table keeps the last match of each string through
+        edits that add and remove repeated triggers.
+
+        """
+
+        rnd = random.Random(0)
+        pieces = ['g1 a ', 'g2 b ', 'g1 c\n', '\n', '# g1 d\n', 'e ',
+                  'g12 f ']
+        regexes = [r'g\d+ (\w)', r'g1 (\w)', r'g\d(?=\s+(\w))']
+        text = ''.join(rnd.choice(pieces) for _ in range(200))
+        view = CodeView(Python(), text)
+        index = TriggerIndex(view)
+        for rgx in regexes:
+            index.collect(rgx)
+        for _ in range(300):
+            start = rnd.randrange(len(text) + 1)
+            end = min(len(text), start + rnd.choice([0, 1, 5, 20]))
+            new = ''.join(rnd.choice(pieces)
+                          for _ in range(rnd.randint(0, 3)))
+            view.replace(start, end, new)
+            text = text[:start] + new + text[end:]
+            for rgx in regexes:
+                expected = {m.group(0): m.group(1)
+                            for m in re.finditer(rgx, view.text)}
+                table = index.collect(rgx)
+                self.assertEqual({k: m.group(1) for k, m in table.items()},
+                                 expected)
@@ -0,0 +1,83 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from unittest import TestCase
+import os
+import shutil
+import tempfile
+from txt2boil import files
+from txt2boil.watch import PollWatcher, watcher
+
+
+class WatcherTester(object):
+
+    """Tests shared by the watchers.
+
+    """
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.fname = os.path.join(self.dir, 'a.rkt')
+        self.write(self.fname, 'a\n')
+        self.watcher = self.makeWatcher([], [self.dir], {'.rkt'})
+
+    def tearDown(self):
+        self.watcher.close()
+        shutil.rmtree(self.dir)
+
+    def write(self, fname, text):
+        with open(fname, 'w') as f:
+            f.write(text)
+
+    def testChanges(self):
+        """Test that changed marked files are reported.
+
+        """
+
+        self.assertEqual(self.watcher.poll(0.05), [])
+        self.write(self.fname, 'b\n')
+        self.write(os.path.join(self.dir, 'b.txt'), 'b\n')
+        self.assertEqual(self.watcher.poll(2), [self.fname])
+
+        sub = os.path.join(self.dir, 'sub')
+        os.mkdir(sub)
+        self.write(os.path.join(sub, 'c.rkt'), 'c\n')
+        self.assertEqual(self.watcher.poll(2), [os.path.join(sub, 'c.rkt')])
+
+    def testSkip(self):
+        """Test that a skipped write isn't reported.
+
+        """
+
+        files.replace(self.fname, 'b\n')
+        self.watcher.skip(self.fname)
+        self.assertEqual(self.watcher.poll(0.5), [])
+        self.write(self.fname, 'c\n')
+        self.assertEqual(self.watcher.poll(2), [self.fname])
+
+
+class PollWatcherTester(WatcherTester, TestCase):
+
+    def makeWatcher(self, *args):
+        return PollWatcher(*args, interval=0.01)
+
+
+class DefaultWatcherTester(WatcherTester, TestCase):
+
+    def makeWatcher(self, *args):
+        return watcher(*args)
@@ -33,9 +33,8 @@ module.
 
 """
 
+import importlib
 import os
-import collections
-from . import langs
 from . import version
 
 
@@ -48,21 +47,57 @@ def language(fname, is_ext=False):
 
     """
 
-    global _langmapping
+    return languageClass(fname, is_ext)()
+
+
+def languageClass(fname, is_ext=False):
+    """Return the language class that fname is suited for.
+
+    This takes the same arguments as language.
+
+    """
 
     # Normalize the fname so that it looks like an extension.
     if is_ext:
-        fname = '.' + fname
-    _, ext = os.path.splitext(fname)
+        ext = '.' + fname
+    else:
+        _, ext = os.path.splitext(fname)
+
+    from . import langs
+    return getattr(langs, _langmapping.get(ext, 'Unknown'))
 
-    return _langmapping[ext]()
 
+def __getattr__(name):
+    """Import the submodules, such as langs, and processMany when they
+    are first used.
 
-_langmapping = collections.defaultdict(langs.Unknown)
-_langmapping.update({e.strip(): getattr(langs, nm)
-                     for nm in langs.__all__
-                     for e in getattr(langs, nm).ext})
+    """
 
-__doc__ = __doc__.format('\n'.join(map('- {}'.format, langs.__all__)))
+    if name == 'processMany':
+        from .batch import processMany
+        return processMany
+    if name.startswith('_'):
+        raise AttributeError(name)
+    try:
+        return importlib.import_module('.' + name, __name__)
+    except ImportError:
+        raise AttributeError(name)
+
+
+# The name of the language class in langs for each extension.  It is
+# written out rather than collected from the classes so that finding a
+# file's language doesn't import them all; test/testimport.py checks
+# that it agrees with the ext field of every class.
+_langmapping = {
+    '.c': 'C', '.h': 'C',
+    '.cc': 'CXX', '.cpp': 'CXX', '.hh': 'CXX', '.hpp': 'CXX',
+    '.java': 'Java',
+    '.tex': 'LaTeX', '.sty': 'LaTeX', '.cls': 'LaTeX',
+    '.py': 'Python',
+    '.rkt': 'Racket',
+}
+
+__doc__ = __doc__.format('\n'.join(map('- {}'.format,
+                                        sorted(set(_langmapping.values())))))
 __version__ = version.version
-__all__ = ['language']
+__all__ = ['language', 'languageClass', 'processMany']
@@ -23,44 +23,302 @@ regexs.
 If --in-place is specified then the files are updated in place, if not
 then they are printed to stdout.
 
+Run "txt2boil serve" to start a JSON-RPC server instead (see
+txt2boil.server).
+
 """
 
 import argparse
-import collections
 import sys
-import textwrap
 import os
-from . import langs
-from . import language
+from . import files
+from . import _langmapping
+from .batch import _cached
+from .batch import _generateFile
+from .batch import _language
 from . import __version__ as version
 
 
+# Everything that is only needed by some options, or once a file is
+# actually processed, is imported where it is used so that starting up
+# stays cheap.
+
+
+def _process(job):
+    """Generate the boilerplate for one file.
+
+    job is a tuple of the file name, the --lang argument, the mode,
+    the ResultCache to use (if any), the --encoding argument and
+    whether to record the phases of the work.  The mode is 'print' to
+    return the output, 'in-place' to modify the file in place, 'list'
+    to return the file name if it has any marker comments, 'check' to
+    return where the file is out of date, if it is, or 'diff' to
+    return the changes it needs as a unified diff.
+    Return the file name, the text to print (if any), whether the file
+    changed, an error message (if any), the process id and phases
+    recorded (if asked for) and the number of bytes written to the
+    cache.
+
+    """
+
+    fname, lang, mode, cache, encoding, traced = job
+    trace = None
+    if not traced:
+        out = _generate(fname, lang, mode, cache, encoding)
+    else:
+        from .core import instrument
+        events = []
+        hook = lambda *event: events.append(event)
+        instrument.addHook(hook)
+        try:
+            with instrument.span('file', fname=fname):
+                out = _generate(fname, lang, mode, cache, encoding)
+        finally:
+            instrument.removeHook(hook)
+        trace = os.getpid(), events
+    written = 0 if cache is None else cache.takeWritten()
+    return (fname,) + out + (trace, written)
+
+
+def _generate(fname, lang, mode, cache, encoding=None):
+    """Do the work of _process, returning the text to print, whether
+    the file changed and an error message.
+
+    Files are only written in place when their text has changed, so
+    that their modification times are left alone otherwise, and they
+    aren't even read if they lack all the marker keywords.  Printed
+    and modified files are generated by batch._generateFile, which is
+    shared with processMany.
+
+    """
+
+    from .core import GenError
+    from .core import instrument
+
+    try:
+        language = _language(fname, lang)
+        keys = language.keywords()
+        if (mode != 'print' and keys is not None and
+                not files.contains(fname, keys, encoding)):
+            return None, False, None
+
+        # generate the new output according to the language
+        if mode in ('print', 'in-place'):
+            orig, text = _generateFile(fname, language, cache, encoding,
+                                       mode == 'in-place')
+            return (text if mode == 'print' else None), text != orig, None
+
+        # load the file
+        with instrument.span('read') as info:
+            with open(fname, encoding=encoding) as f:
+                orig = f.read()
+            info['bytes'] = len(orig)
+
+        if mode == 'list':
+            text = fname + '\n' if language.marked(orig) else None
+            return text, False, None
+        return _check(fname, language, orig, cache, mode == 'diff')
+    except (GenError, EnvironmentError) as err:
+        return None, False, str(err)
+    except Exception as err:
+        return None, False, '{}: {}'.format(type(err).__name__, err)
+
+
+def _check(fname, language, orig, cache, diff):
+    """Do the work of _generate for --check and --diff.
+
+    Without diff, only as much of the file is generated as it takes to
+    find the first region that is out of date.  Files that turn out to
+    be up to date are cached as they are.
+
+    """
+
+    key = text = None
+    if cache is not None:
+        key = cache.key(type(language), orig)
+        text = cache.get(key)
+    if text is None and not diff:
+        edit = language.firstEdit(orig)
+        if edit is not None:
+            line = orig.count('\n', 0, edit[0]) + 1
+            return _stale(fname, line), True, None
+        if key is not None:
+            cache.put(key, orig)
+        return None, False, None
+    if text is None:
+        text = _cached(language, orig, cache)
+    if text == orig:
+        return None, False, None
+    if diff:
+        import difflib
+        out = difflib.unified_diff(orig.splitlines(True),
+                                   text.splitlines(True), fname, fname)
+        return ''.join(out), True, None
+    old, new = orig.splitlines(True), text.splitlines(True)
+    line = next((i for (i, (a, b)) in enumerate(zip(old, new), 1)
+                 if a != b), min(len(old), len(new)) + 1)
+    return _stale(fname, line), True, None
+
+
+def _stale(fname, line):
+    """Return the report of fname being out of date from line on."""
+
+    return '{}:{}: out of date\n'.format(fname, line)
+
+
+def _exts():
+    """Return the set of extensions with a language."""
+
+    return set(_langmapping)
+
+
+def _files(args):
+    """Yield the names of the files to process.
+
+    Directories in args.files are walked recursively for files with a
+    known extension, and the NUL separated list in args.files_from is
+    read as it is needed.
+
+    """
+
+    exts = _exts()
+    for fname in args.files:
+        if os.path.isdir(fname):
+            for f in files.walk(fname, exts, args.ignore_file):
+                yield f
+        else:
+            yield fname
+
+    if args.files_from is not None:
+        for fname in files.readList(args.files_from):
+            yield fname
+
+
+def _stream(names, lang, encoding):
+    """Stream each of names, or standard input for -, to standard output
+    with its boilerplate filled in.
+
+    Return the exit status.
+
+    """
+
+    from .core import GenError
+    status = 0
+    for fname in names:
+        try:
+            if fname == '-':
+                _language(fname, lang).genStream(sys.stdin, sys.stdout)
+                continue
+            with open(fname, encoding=encoding) as f:
+                _language(fname, lang).genStream(f, sys.stdout)
+        except (GenError, EnvironmentError) as err:
+            sys.stderr.write('{}: {}\n'.format(fname, err))
+            status = 1
+    return status
+
+
+def _watch(watcher, lang, cache, encoding):
+    """Regenerate the files reported by watcher until interrupted.
+
+    """
+
+    try:
+        while True:
+            for fname in watcher.poll():
+                _, changed, err = _generate(fname, lang, 'in-place', cache,
+                                            encoding)
+                if err is not None:
+                    sys.stderr.write('{}: {}\n'.format(fname, err))
+                elif changed:
+                    watcher.skip(fname)
+                    sys.stderr.write('{}: updated\n'.format(fname))
+    except KeyboardInterrupt:
+        pass
+
+
 def main(argv=sys.argv[1:]):
     """The main method."""
 
     global ext_lang
 
+    if argv[:1] == ['serve']:
+        from . import server
+        return server.main(argv[1:])
+
     parser = argparse.ArgumentParser(description=description,
                                      epilog=epilog)
     parser.add_argument('files', metavar='FILES', nargs='*',
-                        help='the files to process')
+                        help='the files to process, directories are '
+                        'searched recursively')
+    parser.add_argument('--files-from', metavar='FILE',
+                        type=argparse.FileType('r'),
+                        help='also process the NUL separated list of '
+                        'files in FILE (- for standard input)')
+    parser.add_argument('--ignore-file', metavar='NAME', action='append',
+                        help='skip the paths listed in files called NAME '
+                        'when searching directories (default: '
+                        '{})'.format(', '.join(files.ignoreFiles)))
     parser.add_argument('--version', action='version', version=version)
     parser.add_argument('-i', '--in-place', action='store_true',
                         help='modify files inplace')
+    parser.add_argument('--list-marked', action='store_true',
+                        help='only print the names of the files with '
+                        'marker comments')
+    parser.add_argument('--check', action='store_true',
+                        help='only report where files are out of date, '
+                        'exiting with status 1 if any are')
+    parser.add_argument('--diff', action='store_true',
+                        help='print the changes that out of date files '
+                        'need as unified diffs (implies --check)')
+    parser.add_argument('--watch', action='store_true',
+                        help='keep regenerating the files and directories '
+                        'given as they change (requires --in-place)')
+    parser.add_argument('--stream', action='store_true',
+                        help='read each file, or standard input if there '
+                        'are none, a blank line delimited segment at a '
+                        'time and print it (requires --lang for '
+                        'standard input)')
+    parser.add_argument('--stats', action='store_true',
+                        help='print how long each phase of the work took '
+                        'and the slowest files to stderr')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='write the phases of the work to FILE as '
+                        'Chrome trace-event JSON')
     parser.add_argument('--print-langs', action='store_true',
                         help='print out all the supported languages')
     parser.add_argument('--lang', action='store', default='auto',
                         help='use the language with given extention')
+    parser.add_argument('--encoding', metavar='NAME',
+                        help='read and write files in the encoding NAME '
+                        '(default: the locale\'s)')
+    parser.add_argument('-j', '--jobs', metavar='N', type=int, default=1,
+                        help='process files in N worker processes '
+                        '(0 for one per CPU)')
+    parser.add_argument('--pygen-jobs', metavar='N', type=int,
+                        help='run Python Gen code in N worker processes')
+    parser.add_argument('--pygen-timeout', metavar='SECONDS', type=float,
+                        help='the time limit for each Python Gen snippet '
+                        '(requires --pygen-jobs)')
+    parser.add_argument('--cache-dir', metavar='DIR',
+                        help='reuse the outputs of earlier runs stored '
+                        'in DIR')
+    parser.add_argument('--cache-size', metavar='MB', type=float,
+                        default=256,
+                        help='evict the least recently used outputs '
+                        'once the cache is larger than MB megabytes '
+                        '(default: %(default)s)')
     args = parser.parse_args(argv)
 
     # Print the current set of working languages.
     if args.print_langs:
+        import textwrap
+        from . import langs
         parser.print_usage()
         sys.stdout.write('\n')
         sys.stdout.write(textwrap.fill(textwrap.dedent("""\
         The following languages are supported:
         """)) + '\n')
-        for cls in sorted({getattr(langs, nm) for nm in langs.__all__}):
+        for cls in [getattr(langs, nm) for nm in langs.__all__]:
             l = cls.__name__
             out = cls.__doc__.split('\n\n')[0]
             out = out + ' (' + ', '.join(cls.ext) + ')'
@@ -75,27 +333,132 @@ def main(argv=sys.argv[1:]):
 
         parser.exit(0)          # Exit once we're done
 
-    if not args.files:
+    args.check = args.check or args.diff
+    if args.stream:
+        if (args.in_place or args.list_marked or args.watch or
+                args.check):
+            parser.error('--stream cannot be combined with --in-place, '
+                         '--list-marked, --watch or --check')
+        names = args.files
+        if args.files_from is not None:
+            names = list(_files(args))
+        if '-' in (names or ['-']) and args.lang == 'auto':
+            parser.error('--stream needs --lang to read standard input')
+        status = _stream(names or ['-'], args.lang, args.encoding)
+        if status:
+            parser.exit(status)
+        return
+
+    if not args.files and args.files_from is None:
         parser.print_usage()
 
-    for fname in args.files:
-        # load the file
-        with open(fname) as f:
-            text = f.read()
+    if args.check and (args.in_place or args.list_marked or args.watch):
+        parser.error('--check and --diff cannot be combined with '
+                     '--in-place, --list-marked or --watch')
+    if args.watch and not args.in_place:
+        parser.error('--watch requires --in-place')
+    if args.in_place and args.list_marked:
+        parser.error('--list-marked cannot be combined with --in-place')
+    if args.jobs != 1 and args.pygen_jobs:
+        parser.error('--pygen-jobs cannot be combined with --jobs')
+    if args.pygen_timeout is not None and not args.pygen_jobs:
+        parser.error('--pygen-timeout requires --pygen-jobs')
+    executor = None
+    if args.pygen_jobs:
+        from . import pygen
+        executor = pygen.PyGenPool(args.pygen_jobs, args.pygen_timeout)
+        pygen.executor = executor
 
-        # generate the new output according to the language
-        if args.lang == 'auto':
-            l = language(fname)
-        else:
-            l = language(args.lang, True)
-        text = l.gen(text)
+    cache = None
+    if args.cache_dir is not None:
+        from .cache import ResultCache
+        cache = ResultCache(args.cache_dir, int(args.cache_size * 2 ** 20))
 
-        # emit the output
-        if args.in_place:
-            with open(fname, 'w') as f:
-                f.write(text)
+    if args.list_marked:
+        mode = 'list'
+    elif args.diff:
+        mode = 'diff'
+    elif args.check:
+        mode = 'check'
+    elif args.in_place:
+        mode = 'in-place'
+    else:
+        mode = 'print'
+    stats = None
+    if args.stats or args.trace:
+        from .stats import Stats
+        stats = Stats()
+    jobs = ((fname, args.lang, mode, cache, args.encoding,
+             stats is not None) for fname in _files(args))
+    pool = None
+    status = changed = count = 0
+    watcher = None
+    try:
+        # Start watching first so that no change is missed.
+        if args.watch:
+            from . import watch
+            watcher = watch.watcher(
+                [f for f in args.files if not os.path.isdir(f)],
+                [f for f in args.files if os.path.isdir(f)],
+                _exts(), args.ignore_file)
+
+        # Results come back in the order of the files, however many
+        # workers there are.  The number of files isn't known up front,
+        # so they are handed out in small batches.
+        if args.jobs != 1:
+            import multiprocessing
+            n = args.jobs or multiprocessing.cpu_count()
+            pool = multiprocessing.Pool(n)
+            results = pool.imap(_process, jobs, 8)
         else:
-            sys.stdout.write(text)
+            results = map(_process, jobs)
+        for fname, text, c, err, trace, written in results:
+            if trace is not None:
+                stats.add(fname, *trace)
+            if written:
+                cache.addWritten(written)
+            count += 1
+            changed += c
+            if c and watcher is not None:
+                watcher.skip(fname)
+            if err is not None:
+                sys.stderr.write('{}: {}\n'.format(fname, err))
+                status = 1
+            elif text is not None:
+                sys.stdout.write(text)
+
+        if watcher is not None:
+            if pool is not None:
+                pool.terminate()
+                pool = None
+            if count:
+                sys.stderr.write('{} of {} files changed\n'.format(changed,
+                                                                  count))
+            _watch(watcher, args.lang, cache, args.encoding)
+    finally:
+        if watcher is not None:
+            watcher.close()
+        if pool is not None:
+            pool.terminate()
+        if executor is not None:
+            executor.terminate()
+            pygen.executor = None
+        if cache is not None:
+            cache.prune()
+
+    if args.in_place and count and not args.watch:
+        sys.stderr.write('{} of {} files changed\n'.format(changed, count))
+    if args.check and count:
+        sys.stderr.write('{} of {} files out of date\n'.format(changed,
+                                                              count))
+        if changed:
+            status = 1
+    if args.stats:
+        stats.report(sys.stderr)
+    if args.trace:
+        stats.writeTrace(args.trace)
+    if status:
+        parser.exit(status)
 
 
 description = __doc__
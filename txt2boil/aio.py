@@ -0,0 +1,136 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Generate boilerplate from asyncio without blocking the event loop.
+
+A Runner does the work of batch.processMany one source at a time in an
+executor, reading and writing files there too, so the event loop only
+waits on futures.  The default executor of the loop (a thread pool) is
+used unless another is given; a concurrent.futures.ProcessPoolExecutor
+runs the work truly in parallel.  For example,
+
+    runner = Runner(ProcessPoolExecutor(), limit=4)
+    text = await runner.gen(text, name='a.py')
+    async for r in runner.processMany(fnames, write=True):
+        ...
+
+Cancelling a call stops it from waiting, but work that has already
+been handed to the executor runs to completion; a file that it writes
+is replaced atomically, so it is left either as it was or regenerated.
+
+"""
+
+import asyncio
+import collections
+from . import batch
+
+
+class Runner(object):
+
+    """Run the work of batch in an executor on behalf of asyncio code.
+
+    executor - the concurrent.futures executor to run the work in, or
+               None for the event loop's default
+    limit    - the most sources to work on at once, or None for no
+               limit beyond the executor's
+
+    """
+
+    def __init__(self, executor=None, limit=None):
+        self.executor = executor
+        self.limit = limit
+        self._slots = None if limit is None else asyncio.Semaphore(limit)
+
+    async def _run(self, job):
+        """Return the Result of batch._process(job) run in the executor,
+        once there is room for it.
+
+        """
+
+        loop = asyncio.get_running_loop()
+        if self._slots is None:
+            return await loop.run_in_executor(self.executor,
+                                              batch._process, job)
+        async with self._slots:
+            return await loop.run_in_executor(self.executor,
+                                              batch._process, job)
+
+    async def _source(self, src):
+        """Return the name and text of src as batch._source does, reading
+        file objects in the event loop's default executor.
+
+        """
+
+        if isinstance(src, (str, tuple)):
+            return batch._source(src)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, batch._source, src)
+
+    async def gen(self, text, lang='auto', name=''):
+        """Return text filled with autogenerated code.
+
+        The language is picked by lang or else by name, as for
+        processMany.  Errors are raised as gen raises them.
+
+        """
+
+        result = await self._run((name, text, lang, False, None, None,
+                                  False))
+        if result.error is not None:
+            raise result.error
+        return result.output
+
+    async def process(self, source, lang='auto', write=False, cache=None,
+                      encoding=None, traced=False):
+        """Return the batch.Result of processing source.
+
+        The source and options are as for batch.processMany.
+
+        """
+
+        name, text = await self._source(source)
+        return await self._run((name, text, lang, write, cache, encoding,
+                                traced))
+
+    async def processMany(self, sources, window=None, **options):
+        """Yield the batch.Result of processing each of sources, in order.
+
+        The options are those of process.  At most window sources,
+        which defaults to twice the limit (or 16), are in flight at a
+        time, and those still in flight are cancelled if the caller
+        stops early.
+
+        """
+
+        if window is None:
+            window = 2 * self.limit if self.limit else 16
+        pending = collections.deque()
+        try:
+            for src in sources:
+                pending.append(asyncio.ensure_future(
+                    self.process(src, **options)))
+                if len(pending) >= window:
+                    yield await pending.popleft()
+            while pending:
+                yield await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+__all__ = ['Runner']
@@ -0,0 +1,240 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Generate the boilerplate of many sources from Python.
+
+processMany is the library counterpart of the command line interface:
+it takes a sequence of files and in-memory sources and returns their
+results one at a time, in order.  One instance of each language class
+is made per process and reused for every source, so the compiled
+patterns and trigger regexes are shared between them too, and the
+work can be spread over a pool of worker processes.
+
+For example,
+
+    from txt2boil.batch import processMany
+
+    for r in processMany(['a.py', ('b.rkt', text)], write=True):
+        if r.error is not None:
+            print(r.name, r.error)
+
+"""
+
+from . import files
+from . import languageClass
+
+
+# The language instances used by this process, by class.
+_languages = {}
+
+
+def _language(fname, lang):
+    """Return the language instance to process fname with.
+
+    lang is the extension of the language to use, or 'auto' to go by
+    fname's.  One instance of each language class is made per process
+    and reused for every file.
+
+    """
+
+    if lang == 'auto':
+        cls = languageClass(fname)
+    else:
+        cls = languageClass(lang, True)
+    try:
+        return _languages[cls]
+    except KeyError:
+        return _languages.setdefault(cls, cls())
+
+
+def _cached(language, orig, cache, edits=None):
+    """Return the output of language for orig, from cache if it's there.
+
+    The edits are only appended to when the output is generated.
+
+    """
+
+    if cache is None:
+        return language.gen(orig, edits=edits)
+    key = cache.key(type(language), orig)
+    text = cache.get(key)
+    if text is None:
+        text = language.gen(orig, edits=edits)
+        cache.put(key, text)
+    return text
+
+
+def _generateFile(fname, language, cache, encoding, write):
+    """Return the text of the file fname and language's output for it,
+    writing the output back to fname if write is true and it changed.
+
+    The file is memory-mapped, and when its offsets allow it only the
+    generated regions are encoded and the rest is written straight
+    from the map.
+
+    """
+
+    from .core import instrument
+
+    with files.mapped(fname) as data:
+        with instrument.span('read', bytes=len(data)):
+            orig, plain = files.decode(data, encoding)
+        edits = []
+        text = _cached(language, orig, cache, edits)
+        if write and text != orig and plain and edits:
+            with instrument.span('write', bytes=len(text)):
+                files.splice(fname, data, edits, encoding)
+            return orig, text
+    if write and text != orig:
+        with instrument.span('write', bytes=len(text)):
+            files.replace(fname, text, encoding)
+    return orig, text
+
+
+class Result(object):
+
+    """The result of processing one source.
+
+    name    - the file name, or the name given with the text
+    output  - the text with its boilerplate generated, or None if
+              there was an error
+    changed - whether the output differs from the text
+    error   - the exception raised while processing the source, if any
+    timings - a dictionary of the seconds spent on the source, under
+              'total', and in each phase if they were traced
+
+    """
+
+    def __init__(self, name, output, changed, error, timings):
+        self.name = name
+        self.output = output
+        self.changed = changed
+        self.error = error
+        self.timings = timings
+
+    def __repr__(self):
+        return 'Result({!r}, changed={!r}, error={!r})'.format(
+            self.name, self.changed, self.error)
+
+
+def _source(src):
+    """Return the name and text of src, or None for the text of a file
+    that is read where it is processed.
+
+    """
+
+    if isinstance(src, str):
+        return src, None
+    if isinstance(src, tuple):
+        return src
+    return getattr(src, 'name', ''), src.read()
+
+
+def _process(job):
+    """Process one source for processMany and return its Result.
+
+    """
+
+    from .core import instrument
+
+    name, text, lang, write, cache, encoding, traced = job
+    events = []
+    if traced:
+        hook = lambda *event: events.append(event)
+        instrument.addHook(hook)
+    start = instrument.clock()
+    try:
+        try:
+            language = _language(name, lang)
+            if text is None:
+                orig, out = _generateFile(name, language, cache, encoding,
+                                          write)
+            else:
+                orig, out = text, _cached(language, text, cache)
+            changed = out != orig
+            error = None
+        except Exception as err:
+            out, changed, error = None, False, err
+    finally:
+        if traced:
+            instrument.removeHook(hook)
+    timings = {'total': instrument.clock() - start}
+    for phase, _, duration, _ in events:
+        timings[phase] = timings.get(phase, 0.0) + duration
+    return Result(name, out, changed, error, timings)
+
+
+def _counted(job):
+    """Return the Result of _process(job) and the number of bytes that
+    it wrote to the job's cache, for a worker process to hand back.
+
+    """
+
+    result = _process(job)
+    cache = job[4]
+    return result, (0 if cache is None else cache.takeWritten())
+
+
+def processMany(sources, lang='auto', write=False, jobs=1, cache=None,
+                encoding=None, traced=False):
+    """Return an iterator of the Results of generating the boilerplate
+    of each of sources, in order.
+
+    Each source is either a file name, a (name, text) pair or a file
+    object, such as an io.StringIO, whose name attribute (if any)
+    picks its language.
+
+    lang     - the extension of the language to use for every source,
+               or 'auto' to go by their names
+    write    - write the output of each file that changed back to it
+    jobs     - the number of worker processes to use, 0 for one per
+               CPU or 1 to work in this process
+    cache    - a cache.ResultCache of earlier outputs to reuse
+    encoding - the encoding of the files, which defaults to the
+               locale's
+    traced   - also time each phase of the work (see core.instrument)
+
+    The sources are only read as they are needed, so there can be any
+    number of them.  File objects are read in this process.  The cache
+    is pruned once the iterator is finished with.
+
+    """
+
+    work = (_source(src) + (lang, write, cache, encoding, traced)
+            for src in sources)
+    pool = None
+    try:
+        if jobs == 1:
+            for job in work:
+                yield _process(job)
+            return
+
+        import multiprocessing
+        pool = multiprocessing.Pool(jobs or multiprocessing.cpu_count())
+        for result, written in pool.imap(_counted, work, 8):
+            if written:
+                cache.addWritten(written)
+            yield result
+    finally:
+        if pool is not None:
+            pool.terminate()
+        if cache is not None:
+            cache.prune()
+
+
+__all__ = ['Result', 'processMany']
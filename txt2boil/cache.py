@@ -0,0 +1,213 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""A persistent cache of generated outputs.
+
+Each entry is keyed by a hash of the input text, the language class
+and the generators it is built from, and the txt2boil version, so a
+hit can return the previous output without parsing anything.  Entries
+are plain files that are written atomically, so the cache directory
+can be shared between concurrent runs and machines.  The least
+recently used entries are evicted once the cache grows past its size
+limit, which is checked against a running total kept in the directory
+rather than by looking at every entry.
+
+"""
+
+import hashlib
+import os
+import tempfile
+from . import version
+
+
+class ResultCache(object):
+
+    """A directory of generated outputs with a size limit in bytes.
+
+    """
+
+    # The number of calls to prune after which every entry is looked
+    # at even if the running total is within the limit, to make up for
+    # updates to it lost to concurrent runs.
+    scanEvery = 100
+
+    def __init__(self, directory, maxsize=None):
+        self.directory = directory
+        self.maxsize = maxsize
+        self._written = 0
+
+    def __getstate__(self):
+        # A copy sent to a worker process starts its own count of the
+        # bytes written, which is handed back with takeWritten.
+        state = dict(self.__dict__)
+        state['_written'] = 0
+        return state
+
+    def key(self, cls, text):
+        """Return the key of the output of language cls on text."""
+
+        h = hashlib.sha256(version.version.encode('utf-8'))
+        for c in cls.__mro__:
+            h.update('\0{}.{}'.format(c.__module__,
+                                      c.__name__).encode('utf-8'))
+        h.update(b'\0\0')
+        h.update(text.encode('utf-8', 'surrogateescape'))
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key[2:])
+
+    def get(self, key):
+        """Return the output stored under key, or None if there isn't
+        one.
+
+        """
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                text = f.read().decode('utf-8', 'surrogateescape')
+            os.utime(path, None)
+        except (IOError, OSError, ValueError):
+            return None
+        return text
+
+    def put(self, key, text):
+        """Store text under key, ignoring any failure."""
+
+        path = self._path(key)
+        try:
+            dname = os.path.dirname(path)
+            if not os.path.isdir(dname):
+                os.makedirs(dname)
+            data = text.encode('utf-8', 'surrogateescape')
+            self._write(dname, path, data)
+            self._written += len(data)
+        except (IOError, OSError):
+            pass
+
+    def takeWritten(self):
+        """Return the number of bytes written by this object since the
+        last call, or prune, and start counting again.
+
+        A worker process passes the count back to the process that
+        prunes the cache, to add to its own with addWritten.
+
+        """
+
+        written, self._written = self._written, 0
+        return written
+
+    def addWritten(self, written):
+        """Add the number of bytes that another copy of this object wrote
+        to those counted towards the running total.
+
+        """
+
+        self._written += written
+
+    def _write(self, dname, path, data):
+        """Atomically write data to path, through a temporary file in
+        dname.
+
+        """
+
+        fd, tmp = tempfile.mkstemp(dir=dname, prefix='.')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _total(self):
+        """Return the running total of the size of the entries and the
+        number of calls to prune since every entry was looked at, or
+        None if there is no total.
+
+        """
+
+        try:
+            with open(os.path.join(self.directory, '.total')) as f:
+                total, runs = map(int, f.read().split())
+        except (IOError, OSError, ValueError):
+            return None
+        return total, runs
+
+    def _setTotal(self, total, runs):
+        """Save the running total, ignoring any failure."""
+
+        try:
+            self._write(self.directory, os.path.join(self.directory,
+                                                     '.total'),
+                        '{} {}\n'.format(total, runs).encode('ascii'))
+        except (IOError, OSError):
+            pass
+
+    def prune(self):
+        """Evict the least recently used entries until the cache fits
+        in its size limit.
+
+        The entries are only looked at when the running total, which
+        counts every entry written by this process since the last
+        call, and those added with addWritten, is over the limit, or
+        every scanEvery calls.
+
+        """
+
+        if self.maxsize is None:
+            return
+        written = self.takeWritten()
+        found = self._total()
+        if found is not None and found[1] + 1 < self.scanEvery:
+            total = found[0] + written
+            if total <= self.maxsize:
+                self._setTotal(total, found[1] + 1)
+                return
+        self._setTotal(self._evict(), 0)
+
+    def _evict(self):
+        """Evict the least recently used entries until the cache fits in
+        its size limit and return the size of the rest.
+
+        """
+
+        entries = []
+        total = 0
+        try:
+            for d in os.scandir(self.directory):
+                if not d.is_dir():
+                    continue
+                for e in os.scandir(d.path):
+                    if e.name.startswith('.'):
+                        continue
+                    st = e.stat()
+                    entries.append((st.st_mtime, st.st_size, e.path))
+                    total += st.st_size
+        except (IOError, OSError):
+            return total
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.maxsize:
+                break
+            try:
+                os.unlink(path)
+            except (IOError, OSError):
+                pass
+            total -= size
+        return total
+
+
+__all__ = ['ResultCache']
@@ -24,9 +24,9 @@ using CMI.
 
 There are two API's.  One is the generic descripter that takes a
 binary operation and uses it to merge two answers together.  The other
-is two functions: one which locates the first non-None object and
-returns it, and the other which finds the minimum element of all the
-posibilities.
+is three functions: one which locates the first non-None object and
+returns it, one which finds the minimum element of all the
+posibilities and one which takes the union of them.
 
 Note that all the cls arguments to the descriptors must be passed
 wrapped in a lambda like so:
@@ -41,6 +41,7 @@ Otherwise the name Foo won't be defined yet.
 """
 
 from functools import wraps
+import types
 
 
 class AbstractCMI:
@@ -51,9 +52,16 @@ class AbstractCMI:
     binary operation on the results of the current function and the
     super-class' function of the same name.
 
+    The chain of functions is worked out once for each class it is
+    called on, by walking the class' MRO, rather than through super
+    on every call.  If stop is given then it is called on each result
+    and the rest of the chain is skipped when it returns true, in
+    which case that result must be what merge would have returned
+    anyway.
+
     """
 
-    def __init__(self, cls, merge):
+    def __init__(self, cls, merge, stop=None):
         """Initialize the abstract descriptor.
 
         Note that cls has to be wrapped in a lambda because otherwise
@@ -63,25 +71,80 @@ class AbstractCMI:
         cls   - the current class wrapped in a lambda
         merge - the binary operator that will determine the final
                 result
+        stop  - the test for a result that makes the rest of the
+                chain irrelevant
 
         """
 
         self.cls = cls
         self.merge = merge
+        self.stop = stop
+        self._chains = {}
+
+    def _chain(self, typ, func):
+        """Return the (function, merge, stop) of each link of the chain
+        that starts here for instances of typ.
 
-    def _getSuperFunc(self, s, func):
-        """Return the the super function."""
+        The chain follows typ's MRO through the functions wrapped by
+        AbstractCMI up to the first one that isn't, whose merge is
+        None.  Attributes other than plain functions are looked up
+        through super when they are called.
+
+        """
+
+        name = func.__name__
+        mro = typ.__mro__
+        i = mro.index(self.cls())
+        chain = [(func, self.merge, self.stop)]
+        for k in mro[i + 1:]:
+            if name not in k.__dict__:
+                continue
+            attr = k.__dict__[name]
+            cmi = getattr(attr, '_cmi', None)
+            if cmi is not None:
+                chain.append((cmi[1], cmi[0].merge, cmi[0].stop))
+                continue
+            if not isinstance(attr, types.FunctionType):
+                attr = self._superFunc(mro[mro.index(k) - 1], name)
+            chain.append((attr, None, None))
+            break
+        else:
+            chain.append((self._superFunc(mro[-1], name), None, None))
+        return tuple(chain)
+
+    @staticmethod
+    def _superFunc(cls, name):
+        """Return a function that calls the attribute name of super(cls,
+        s) on s.
+
+        """
 
-        return getattr(super(self.cls(), s), func.__name__)
+        def call(s, *args, **kwargs):
+            return getattr(super(cls, s), name)(*args, **kwargs)
+        return call
 
     def __call__(self, func):
         """Apply this abstract descriptor to func."""
 
+        chains = self._chains
+
         @wraps(func)
         def wrapper(s, *args, **kwargs):
-            a = func(s, *args, **kwargs)
-            b = self._getSuperFunc(s, func)(*args, **kwargs)
-            return self.merge(a, b)
+            typ = type(s)
+            try:
+                chain = chains[typ]
+            except KeyError:
+                chain = chains.setdefault(typ, self._chain(typ, func))
+            done = []
+            for f, merge, stop in chain:
+                a = f(s, *args, **kwargs)
+                if merge is None or stop is not None and stop(a):
+                    break
+                done.append((merge, a))
+            for merge, b in reversed(done):
+                a = merge(b, a)
+            return a
+        wrapper._cmi = (self, func)
         return wrapper
 
 
@@ -94,6 +157,19 @@ def minCMI(cls):
 def nonNoneCMI(cls):
     """Return an AbstractCMI that locates the first non-None element."""
 
-    return AbstractCMI(cls, lambda x, y: x if x is not None else y)
+    return AbstractCMI(cls, lambda x, y: x if x is not None else y,
+                       lambda x: x is not None)
+
+
+def unionCMI(cls):
+    """Return an AbstractCMI that takes the union of all the sets.
+
+    None stands for a set that isn't known, so the union is None if
+    any of the sets is.
+
+    """
+
+    return AbstractCMI(cls, lambda x, y: None if x is None or y is None
+                       else x | y, lambda x: x is None)
 
-__all__ = ['AbstractCMI', 'minCMI', 'nonNoneCMI']
+__all__ = ['AbstractCMI', 'minCMI', 'nonNoneCMI', 'unionCMI']
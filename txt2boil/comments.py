@@ -16,9 +16,20 @@
 # along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
 
 from .core import *
+from . import cmi
 import re
 
 
+def _lineEnd(text, pos):
+    """Return the end of the line of text[pos - 1], which is as far as
+    a search for a line comment starting before pos reads.
+
+    """
+
+    i = text.find('\n', max(pos - 1, 0))
+    return len(text) if i < 0 else i + 1
+
+
 class Comments(Extractor):
 
     """A base class to identify subclasses as being comment classes.
@@ -39,6 +50,10 @@ class Shell(Comments):
     def lineComment(self, text, start):
         return self.__regex.search(text, start)
 
+    @cmi.AbstractCMI(lambda: Shell, max)
+    def commentHorizon(self, text, pos):
+        return _lineEnd(text, pos)
+
 
 class Lisp(Comments):
 
@@ -51,6 +66,10 @@ class Lisp(Comments):
     def lineComment(self, text, start):
         return self.__regex.search(text, start)
 
+    @cmi.AbstractCMI(lambda: Lisp, max)
+    def commentHorizon(self, text, pos):
+        return _lineEnd(text, pos)
+
 
 class C(Comments):
 
@@ -63,6 +82,16 @@ class C(Comments):
     def blockComment(self, text, start):
         return self.__regex.search(text, start)
 
+    @cmi.AbstractCMI(lambda: C, max)
+    def commentHorizon(self, text, pos):
+        # A search reads up to the first */ after the /* it starts with,
+        # so the last /* before pos reads the furthest.
+        o = text.rfind('/*', 0, pos + 1)
+        if o < 0:
+            return pos
+        i = text.find('*/', o + 2)
+        return len(text) if i < 0 else max(pos, i + 2)
+
 
 class CXX(C):
 
@@ -75,6 +104,10 @@ class CXX(C):
     def lineComment(self, text, start):
         return self.__regex.search(text, start)
 
+    @cmi.AbstractCMI(lambda: CXX, max)
+    def commentHorizon(self, text, pos):
+        return _lineEnd(text, pos)
+
 
 class TeX(Comments):
 
@@ -84,3 +117,7 @@ class TeX(Comments):
 
     def lineComment(self, text, start):
         return self.__regex.search(text, start)
+
+    @cmi.AbstractCMI(lambda: TeX, max)
+    def commentHorizon(self, text, pos):
+        return _lineEnd(text, pos)
@@ -19,8 +19,10 @@
 
 """
 
+from .codeview import CodeView
 from .extractor import Extractor
-from .gen import Gen
+from .gen import Gen, GenError
 from .hookedre import HookedRegex
 
-__all__ = ['Extractor', 'Gen', 'HookedRegex']
+__all__ = ['CodeView', 'Extractor', 'Gen', 'GenError',
+           'HookedRegex']
@@ -0,0 +1,354 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""A view of source code with its comments stripped out.
+
+"""
+
+from bisect import bisect_right
+from .scanner import _Scanner
+
+
+class _Buffer(object):
+
+    """A string that is cheap to edit near its last edit.
+
+    The string is kept as (text, start, end) spans on either side of
+    a gap, which is moved to each edit, so an edit only copies what it
+    inserts rather than the whole string.
+
+    """
+
+    def __init__(self):
+        self._left = []         # spans before the gap
+        self._right = []        # spans after the gap, in reverse
+        self._gap = 0
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def _move(self, pos):
+        """Move the gap to pos."""
+
+        while self._gap > pos:
+            t, i, j = self._left.pop()
+            n = self._gap - (j - i)
+            if n < pos:
+                k = i + pos - n
+                self._left.append((t, i, k))
+                self._right.append((t, k, j))
+                n = pos
+            else:
+                self._right.append((t, i, j))
+            self._gap = n
+        while self._gap < pos:
+            t, i, j = self._right.pop()
+            n = self._gap + (j - i)
+            if n > pos:
+                k = i + pos - self._gap
+                self._left.append((t, i, k))
+                self._right.append((t, k, j))
+                n = pos
+            else:
+                self._left.append((t, i, j))
+            self._gap = n
+
+    def replace(self, start, end, new):
+        """Replace the string's [start:end] with new."""
+
+        self._move(start)
+        n = end - start
+        while n:
+            t, i, j = self._right.pop()
+            if j - i > n:
+                self._right.append((t, i + n, j))
+                break
+            n -= j - i
+        if new:
+            self._left.append((new, 0, len(new)))
+            self._gap += len(new)
+        self._len += len(new) - (end - start)
+
+    def slice(self, start, end):
+        """Return the string's [start:end]."""
+
+        self._move(start)
+        out = []
+        for t, i, j in reversed(self._right):
+            if end - start <= j - i:
+                out.append(t[i:i + end - start])
+                break
+            out.append(t[i:j] if i or j < len(t) else t)
+            start += j - i
+        return ''.join(out)
+
+    def find(self, ch, start):
+        """Return the offset of the first ch at or after start, or -1."""
+
+        self._move(start)
+        for t, i, j in reversed(self._right):
+            k = t.find(ch, i, j)
+            if k >= 0:
+                return start + k - i
+            start += j - i
+        return -1
+
+    def rfind(self, ch, end):
+        """Return the offset of the last ch before end, or -1."""
+
+        self._move(end)
+        for t, i, j in reversed(self._left):
+            end -= j - i
+            k = t.rfind(ch, i, j)
+            if k >= 0:
+                return end + k - i
+        return -1
+
+    def value(self):
+        """Return the whole string, which is kept as one span after."""
+
+        spans = self._left + self._right[::-1]
+        if len(spans) == 1 and spans[0][1:] == (0, len(spans[0][0])):
+            return spans[0][0]
+        text = ''.join(t[i:j] for (t, i, j) in spans)
+        self._left, self._right, self._gap = [], [(text, 0, len(text))], 0
+        if not text:
+            self._right = []
+        return text
+
+
+class CodeView(object):
+
+    """The comment-stripped text of a source, kept up to date as the
+    source is edited.
+
+    Comments are found with Extractor.nextValidComment, each search
+    resuming at the end of the previous comment, and the code is what
+    is left between them.
+
+    The removed comments are kept as (start, end, removed) triples,
+    where removed is the total length of the comments before it.  They
+    are split around a gap at the last edit so that edits which move
+    forward through the source, as Gen.gen's do, only ever touch the
+    comments next to them.  The source and the stripped text are kept
+    in _Buffers in the same way, and are only joined into strings
+    when they are asked for.
+
+    When the extractor knows how far its comment searches can read
+    (see Extractor.commentHorizon) the source is searched again only
+    around an edit, up to where the comments found line up with the
+    old ones.  Otherwise every search is made in the whole source.
+
+    Every function in listeners is called after an edit as f(x, y,
+    n), where the old stripped text's [x:y] was replaced by text[x:x +
+    n].
+
+    """
+
+    def __init__(self, extractor, source):
+        self.extractor = extractor
+        self._source = _Buffer()
+        self._text = _Buffer()
+        self._head = []         # comments before the gap
+        self._tail = []         # comments after the gap, in reverse
+        self._delta = 0         # offset to add to the tail's positions
+        self._removed = 0       # offset to add to the tail's removed
+        self._index = None
+        self._horizon = extractor._horizon()
+        self.listeners = []
+        self.replace(0, 0, source)
+
+    @property
+    def source(self):
+        """The source."""
+
+        return self._source.value()
+
+    @property
+    def text(self):
+        """The stripped text."""
+
+        return self._text.value()
+
+    def span(self, start, end):
+        """Return text[start:end] without joining the whole text."""
+
+        return self._text.slice(start, end)
+
+    def lineStart(self, offset):
+        """Return the start of the line of text[offset]."""
+
+        return self._text.rfind('\n', offset) + 1
+
+    def lineEnd(self, offset):
+        """Return the offset of the newline ending the line of
+        text[offset], or len(text) if there is none.
+
+        """
+
+        i = self._text.find('\n', offset)
+        return len(self._text) if i < 0 else i
+
+    def _pop(self):
+        """Pop the first comment after the gap."""
+
+        s, e, r = self._tail.pop()
+        return s + self._delta, e + self._delta, r + self._removed
+
+    def _push(self, span):
+        """Push span onto the front of the comments after the gap."""
+
+        s, e, r = span
+        self._tail.append((s - self._delta, e - self._delta,
+                           r - self._removed))
+
+    def _seek(self, pos):
+        """Move the gap so that it follows the last comment ending before
+        pos.
+
+        """
+
+        while self._head and self._head[-1][1] >= pos:
+            self._push(self._head.pop())
+        while self._tail and self._tail[-1][1] + self._delta < pos:
+            self._head.append(self._pop())
+
+    def replace(self, start, end, new):
+        """Replace source[start:end] with new and update the stripped text.
+
+        Comments are searched for again from the last one before the
+        edit until the search lines up with a comment that was already
+        found past it, or, when the searches are known not to read far,
+        until it is past the edit and outside of the old comments.
+
+        """
+
+        delta = len(new) - (end - start)
+        self._seek(start)
+        removedBefore = len(self._source) - len(self._text)
+        self._source.replace(start, end, new)
+        self._index = None
+        total = len(self._source)
+        limit = start + len(new)
+
+        # The stripped text only changes between pfx and sfx.
+        pfx, sfx = start, limit
+        if self._tail:
+            pfx = min(pfx, self._tail[-1][0] + self._delta)
+
+        # Drop the comments that overlapped the edited region.
+        while self._tail and self._tail[-1][0] + self._delta < end:
+            sfx = max(sfx, self._tail.pop()[1] + self._delta + delta)
+        self._delta += delta
+
+        lo = removed = 0
+        if self._head:
+            s, lo, r = self._head[-1]
+            removed = r + (lo - s)
+        x, origin = lo - removed, lo
+
+        # The searches are made in a window of the source, from the
+        # character before origin, which is widened whenever a result
+        # might depend on what lies past it.
+        horizon = self._horizon
+        if horizon is None:
+            zlo, zhi = 0, total
+        else:
+            zlo, zhi = max(origin - 1, 0), min(total, limit + 256)
+        window = self._source.slice(zlo, zhi)
+        scanner = _Scanner(window, self.extractor._codeFinders())
+
+        # Strip comments until the search lines up with the old ones.
+        found, hi, y = [], total, len(self._text)
+        while True:
+            if horizon is not None and origin > limit:
+                # Past the edit, and outside of every old comment that
+                # was dropped, the old comments are still right.
+                while (self._tail and
+                       self._tail[-1][0] + self._delta < origin):
+                    sfx = max(sfx, self._tail.pop()[1] + self._delta)
+                if origin >= sfx:
+                    tr = (self._tail[-1][2] + self._removed if self._tail
+                          else removedBefore)
+                    hi, y = origin, origin - delta - tr
+                    self._removed += removed - tr
+                    break
+            scanner.pos = origin - zlo
+            m = next(scanner, None)
+            if zhi < total:
+                q = m[0] + zlo if m else max(origin, limit)
+                if m is None and origin <= limit:
+                    # Nothing starts up to the end of the edit.
+                    if horizon(window, q + 1 - zlo) < len(window):
+                        origin = limit + 1
+                        continue
+                if m is None or horizon(window, q + 1 - zlo) >= len(window):
+                    zhi = min(total, zhi + 2 * (zhi - zlo))
+                    window = self._source.slice(zlo, zhi)
+                    scanner = _Scanner(window, self.extractor._codeFinders())
+                    continue
+            if m is None:
+                if self._tail:
+                    sfx = max(sfx, self._tail[0][1] + self._delta)
+                del self._tail[:]
+                break
+            s, e = m[0] + zlo, m[1] + zlo
+            while self._tail and self._tail[-1][0] + self._delta < s:
+                sfx = max(sfx, self._tail.pop()[1] + self._delta)
+            if s >= limit and self._tail:
+                ts, te, tr = self._pop()
+                if (ts, te) == (s, e):
+                    hi, y = s, s - delta - tr
+                    self._removed += removed - tr
+                    self._push((s, e, removed))
+                    break
+                self._push((ts, te, tr))
+            found.append((s, e, removed))
+            pfx, sfx = min(pfx, s), max(sfx, e)
+            origin, removed = e, removed + (e - s)
+
+        # Splice the newly stripped region into the text.
+        pieces, pos = [], lo
+        for s, e, _ in found:
+            pieces.append(window[pos - zlo:s - zlo])
+            pos = e
+        pieces.append(window[pos - zlo:hi - zlo])
+        region = ''.join(pieces)
+        n = len(self._text)
+        self._text.replace(x, y, region)
+        self._head.extend(found)
+
+        x, y = x + (pfx - lo), y - (hi - sfx)
+        for f in self.listeners:
+            f(x, y, len(self._text) - n + (y - x))
+
+    def toSource(self, offset):
+        """Return the offset in the source of the character at offset in
+        the stripped text.
+
+        """
+
+        if self._index is None:
+            self._seek(len(self._source) + 1)
+            self._index = [s - r for (s, _, r) in self._head]
+        i = bisect_right(self._index, offset)
+        if i == 0:
+            return offset
+        s, e, r = self._head[i - 1]
+        return offset + r + (e - s)
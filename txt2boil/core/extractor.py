@@ -23,6 +23,8 @@
 """
 
 from itertools import groupby
+from .codeview import CodeView
+from .scanner import _Scanner
 import re
 
 
@@ -34,6 +36,9 @@ class Extractor(object):
 
     _emptylineregex = re.compile('^()$^$', re.M)
 
+    # Whether commentHorizon is known for each class, see _horizon.
+    _horizons = {}
+
     def lineComment(self, text, start):
         """Return a match object for a line comment in text starting at start.
 
@@ -54,6 +59,39 @@ class Extractor(object):
 
         pass
 
+    def commentHorizon(self, text, pos):
+        """Return an offset in text that no search of lineComment or
+        blockComment for a comment starting before pos reads past, or
+        len(text) if they may read to its end.
+
+        CodeView uses it to search a source again only around an edit
+        instead of to its end.  Overload it alongside lineComment and
+        blockComment with a cmi.AbstractCMI decorator that takes the
+        max of the answers.  Doing so also promises that the searches
+        don't look back more than one character from where they start.
+        A class that overloads either search but not this one makes
+        CodeView search the whole source.
+
+        """
+
+        return pos
+
+    def _horizon(self):
+        """Return commentHorizon, or None if it isn't known for this
+        class.
+
+        """
+
+        cls = type(self)
+        try:
+            known = self._horizons[cls]
+        except KeyError:
+            known = all('commentHorizon' in c.__dict__ for c in cls.__mro__
+                        if 'lineComment' in c.__dict__ or
+                        'blockComment' in c.__dict__)
+            known = self._horizons.setdefault(cls, known)
+        return self.commentHorizon if known else None
+
     def nextComment(self, text, start=0):
         """Return the next comment found in text starting at start.
 
@@ -111,20 +149,32 @@ class Extractor(object):
 
         """
 
-        # Build a list of comments
-        comm, out = self.nextComment(text, start), []
-        while comm:
-            out.append(comm.group(0))
-            comm = self.nextComment(text, comm.start(0) + 1)
+        scanner = _Scanner(text, self._commentFinders(), start)
+        return [[p for (_, _, p) in c] for c in self._chunks(scanner)]
 
-        # Collect the comments according to whether they are line
-        # comments or block comments.
-        out = [list(g) for (_, g) in groupby(out, self.isLineComment)]
+    def _commentFinders(self):
+        """Return the search functions used to tokenize comments.
 
-        # Filter out seperator lines.
-        out = [i for i in out if i != ['']]
+        """
 
-        return out
+        return [self.lineComment, self.blockComment,
+                self._emptylineregex.search]
+
+    def _chunks(self, scanner):
+        """Yield each chunk found by scanner as a list of (start, end,
+        text) triples.
+
+        Comments are collected according to whether they are line
+        comments or block comments and separator lines are filtered
+        out.
+
+        """
+
+        pieces = ((s, e, scanner.text[s:e]) for (s, e, _) in scanner)
+        for _, g in groupby(pieces, lambda p: self.isLineComment(p[2])):
+            g = list(g)
+            if len(g) != 1 or g[0][2] != '':
+                yield g
 
     def comments(self, text, start=0):
         """Return a list of comments.
@@ -140,8 +190,11 @@ class Extractor(object):
 
         """
 
-        comm = self.nextValidComment(text)
-        while comm:
-            text = text[:comm.start()] + text[comm.end():]
-            comm = self.nextValidComment(text, comm.end(0))
-        return text
+        return CodeView(self, text).text
+
+    def _codeFinders(self):
+        """Return the search functions used to strip comments from code.
+
+        """
+
+        return [self.lineComment, self.blockComment]
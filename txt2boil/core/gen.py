@@ -21,57 +21,358 @@ It then parses them, and adds their content to the code.
 
 """
 
+from .codeview import CodeView
 from .extractor import Extractor
-import re
+from . import instrument
+from . import patterns
+from .scanner import _Scanner
+from .triggers import TriggerIndex
+
+
+class GenError(Exception):
+
+    """An error raised by a generator while generating a marker's output.
+
+    When it escapes from Gen.gen, line is set to the line of the
+    source where the marker's comment starts.
+
+    """
+
+    line = None
+
+    def __str__(self):
+        msg = super(GenError, self).__str__()
+        if self.line is None:
+            return msg
+        return 'line {}: {}'.format(self.line, msg)
+
+
+class _Stale(Exception):
+
+    """Raised by _FirstEdit to stop gen at its first edit.
+
+    """
+
+    pass
+
+
+class _FirstEdit(object):
+
+    """An edit list for gen that stops it at the first edit.
+
+    """
+
+    def append(self, edit):
+        raise _Stale(edit)
 
 
 class _Gen(Extractor):
 
-    def collectTriggers(self, rgx, code):
+    # The keywords of each class, see keywords.
+    _keywords = {}
+
+    # The routing table of each class, see route.
+    _routes = {}
+
+    def keywords(self):
+        """Return the set of literal keywords that every marker comment
+        this generator responds to contains, or None if that isn't
+        known.
+
+        It is None whenever a class defines matchComment without
+        also defining markers.
+
+        """
+
+        cls = type(self)
+        try:
+            return self._keywords[cls]
+        except KeyError:
+            pass
+        known = all('markers' in c.__dict__ for c in cls.__mro__
+                    if 'matchComment' in c.__dict__)
+        keys = frozenset(self.markers()) if known else None
+        return self._keywords.setdefault(cls, keys)
+
+    def _routing(self):
+        """Return the routing table of this generator's class, or None if
+        every comment has to go through matchComment.
+
+        The table is a pair of the keyword lengths, longest first, and
+        a dictionary of the (MRO position, function) pairs of the
+        generators that each keyword starts the comments of.  The
+        functions are the ones wrapped by the CMI decorators, so only
+        the generator itself is asked, and they are taken from the same
+        classes that matchComment's chain goes through.
+
+        """
+
+        cls = type(self)
+        try:
+            return self._routes[cls]
+        except KeyError:
+            pass
+        table = None
+        if self.keywords() is not None:
+            table = {}
+            for i, c in enumerate(cls.__mro__):
+                if 'matchComment' not in c.__dict__:
+                    continue
+                match = c.__dict__['matchComment']
+                chained = hasattr(match, '_cmi')
+                match = match._cmi[1] if chained else match
+                markers = c.__dict__['markers']
+                markers = getattr(markers, '_cmi', (None, markers))[1]
+                for k in markers(self):
+                    table.setdefault(k, []).append((i, match))
+
+                # A matchComment without a CMI decorator ends the
+                # chain, as it does for matchComment itself.
+                if not chained:
+                    break
+            lengths = sorted({len(k) for k in table}, reverse=True)
+            table = lengths, table
+        return self._routes.setdefault(cls, table)
+
+    def route(self, comm):
+        """Return matchComment(comm), asking only the generators whose
+        keyword starts comm.
+
+        Comments that don't start with any keyword are skipped without
+        running a regex.
+
+        """
+
+        table = self._routing()
+        if table is None:
+            return self.matchComment(comm)
+        lengths, table = table
+        found = []
+        for n in lengths:
+            found.extend(table.get(comm[:n], ()))
+        if len(found) > 1:
+            found.sort(key=lambda p: p[0])
+        for _, match in found:
+            m = match(self, comm)
+            if m is not None:
+                return m
+        return None
+
+    def mayBeMarked(self, text, start=0):
+        """Return False if text can't contain a marker comment after
+        start.
+
+        This only looks for the keywords, so it is much faster than
+        marked.
+
+        """
+
+        keys = self.keywords()
+        if keys is None:
+            return True
+        return any(text.find(k, start) != -1 for k in keys)
+
+    def marked(self, text, start=0):
+        """Return True if text contains a marker comment after start.
+
+        """
+
+        if not self.mayBeMarked(text, start):
+            return False
+        scanner = _Scanner(text, self._commentFinders(), start)
+        for chunk in self._chunks(scanner):
+            cc = [p for (_, _, p) in chunk]
+            if self.route(self.extractChunkContent(cc)):
+                return True
+        return False
+
+    def collectTriggers(self, rgx, code, index=None):
         """Return a dictionary of triggers and their corresponding matches
         from the code.
 
+        If a TriggerIndex of the code is given then the matches are
+        looked up in it instead of searching the code again.
+
         """
 
-        return {m.group(0): m for m in re.finditer(rgx, code)}
+        if index is not None:
+            return index.collect(rgx)
+        return {m.group(0): m for m in patterns.compile(rgx).finditer(code)}
 
-    def genOutputs(self, code, match):
+    def genOutputs(self, code, match, index=None):
         """Return a list out template outputs based on the triggers found in
         the code and the template they create.
 
+        code may be None when an index is given, as gen does to avoid
+        joining the stripped text for every marker.
+
         """
 
-        out = sorted((k, match.output(m)) for (k, m) in
-                     self.collectTriggers(match.match, code).items())
+        if not instrument.hooks:
+            triggers = self.collectTriggers(match.match, code, index)
+            return self._render(match, triggers)
+        with instrument.span('triggers') as info:
+            triggers = self.collectTriggers(match.match, code, index)
+            info['count'] = len(triggers)
+        with instrument.span('render', count=len(triggers)) as info:
+            out = self._render(match, triggers)
+            info['bytes'] = sum(map(len, out))
+        return out
+
+    def _render(self, match, triggers):
+        """Return the outputs of match for the triggers, in the order of
+        their text.
+
+        """
+
+        out = sorted((k, match.output(m)) for (k, m) in triggers.items())
         out = list(map(lambda a: a[1], out))
         return out
 
-    def gen(self, text, start=0):
+    def chunkEnd(self, chunk):
+        """Return the end of the comments in chunk, a list of (start, end,
+        text) triples.
+
+        The generated region of a chunk follows its last comment, so
+        GenError is raised if there is code between its comments.
+        That happens when line comments have a line of code between
+        them, and when block comments aren't back to back, since block
+        comments are grouped into one chunk up to the next line
+        comment however far apart they are.
+
+        """
+
+        e = None
+        for s, end, p in chunk:
+            if not p:
+                continue
+            if e is not None and s != e:
+                raise GenError('the comments of a marker are separated '
+                               'by code')
+            e = end
+        return chunk[0][0] if e is None else e
+
+    def regionEnd(self, text, e):
+        """Return the end of the generated region that follows a marker
+        comment ending at e.
+
+        The region runs up to and including the first newline of the
+        next blank line, or to the end of the text if there is none.
+
+        """
+
+        try:
+            return text.index('\n\n', e - 1) + 1
+        except ValueError:
+            return len(text)
+
+    def gen(self, text, start=0, edits=None):
         """Return the source code in text, filled with autogenerated code
         starting at start.
 
+        The comments are tokenized in a single forward pass.  Whenever
+        a chunk matches, its generated region (everything up to the
+        next blank line) is replaced with output generated from the
+        stripped code and the scan resumes right after it.
+
+        If edits is a list then a (start, end, new) triple is appended
+        to it for every region of text that changes, in order and in
+        the offsets of the original text.
+
+        """
+
+        if not self.mayBeMarked(text, start):
+            return text
+        if not instrument.hooks:
+            return self._gen(text, start, edits, self._chunks, self.route)
+        chunks = instrument.Phase('chunk')
+        match = instrument.Phase('match')
+        try:
+            return self._gen(text, start, edits,
+                             lambda s: chunks.iterate(self._chunks(s)),
+                             match.wrap(self.route))
+        finally:
+            chunks.emit()
+            match.emit()
+
+    def firstEdit(self, text, start=0):
+        """Return the first (start, end, new) edit that gen would make to
+        text after start, or None if it is up to date.
+
+        Nothing past the first generated region that differs is
+        generated.
+
+        """
+
+        try:
+            self.gen(text, start, _FirstEdit())
+        except _Stale as stale:
+            return stale.args[0]
+        return None
+
+    def _gen(self, text, start, edits, chunks, matchComment):
+        """Do the work of gen with the given _chunks and matchComment,
+        which may be timed.
+
         """
 
-        for cc in self.chunkComment(text, start):
-            c = self.extractChunkContent(cc)
-            cc = ''.join(cc)
-            m = self.matchComment(c)
-            idx = text.index(cc, start)
-            e = idx + len(cc)
-            if m:
-                assert text[idx:e] == cc
+        self.prefetch(text, start)
+        shift = 0
+        scanner = _Scanner(text, self._commentFinders(), start)
+        view = None
+        while True:
+            for chunk in chunks(scanner):
+                cc = [p for (_, _, p) in chunk]
+                m = matchComment(self.extractChunkContent(cc))
+                if m:
+                    break
+            else:
+                return scanner.result()
+
+            # The scanner's offsets are those of the original text and
+            # the view's are shifted by the regions generated so far.
+            try:
+                e = self.chunkEnd(chunk)
+                end = self.regionEnd(text, e)
+                if view is None:
+                    t = instrument.clock()
+                    view = CodeView(self, text)
+                    index = TriggerIndex(view)
+                    if instrument.hooks:
+                        instrument.emit('code', t, instrument.clock() - t,
+                                        bytes=len(text))
+                view.replace(e + shift, end + shift, '')
+                new = ''.join(self.genOutputs(None, m, index))
+            except GenError as err:
+                err.line = text.count('\n', 0, chunk[0][0]) + 1
+                raise
+            view.replace(e + shift, e + shift, new)
+            if edits is not None and text[e:end] != new:
+                edits.append((e, end, new))
+            scanner.replace(e, end, new)
+            shift += len(new) - (end - e)
+
+    def genStream(self, infile, outfile):
+        """Write the source code read from infile, filled with
+        autogenerated code, to outfile.
+
+        Unlike gen, the text is never read into memory all at once; it
+        is handled a blank line delimited segment at a time.  See the
+        stream module for how it differs from gen.
 
-                try:
-                    end = text.index('\n\n', e - 1) + 1
-                except ValueError:
-                    end = len(text)
-                text = text[:e] + text[end:]
-                new = self.genOutputs(self.code(text), m)
-                new = ''.join(new)
-                text = text[:e] + new + text[e:]
+        """
+
+        from .stream import _Stream
+        _Stream(self).run(infile, outfile)
 
-                return self.gen(text, e + len(new))
-        return text
+    def analyse(self, text):
+        """Return an incremental.Analysis of text, which generates it and
+        then generates it again as it is edited.
+
+        """
+
+        from .incremental import Analysis
+        return Analysis(self, text)
 
 
 class Gen(_Gen):
@@ -110,5 +411,38 @@ class Gen(_Gen):
 
         pass
 
+    def markers(self):
+        """Return the set of literal keywords that the comments matched
+        by matchComment start with.
+
+        Files without any of them are skipped without being parsed,
+        and each comment is only matched against the generators whose
+        keyword it starts with (see route).
+        Overload this method alongside matchComment, with the
+        cmi.unionCMI decorator, like so:
+
+            @cmi.unionCMI(lambda: Foo)
+            def markers(self):
+                return {'Foo Gen:'}
+
+        A generator that overloads matchComment but not markers turns
+        the skipping off.
+
+        """
+
+        return frozenset()
+
+    def prefetch(self, text, start=0):
+        """Get a head start on generating the output for text.
+
+        This is called once at the start of every call to gen.
+        Overload it, with the cmi.nonNoneCMI decorator as for
+        matchComment, to start expensive work early, such as handing
+        it to other processes.
+
+        """
+
+        pass
+
 
-__all__ = ['Gen']
+__all__ = ['Gen', 'GenError']
@@ -19,6 +19,7 @@
 
 """
 
+from . import patterns
 import re
 
 
@@ -30,17 +31,22 @@ class HookedRegex(object):
     """
 
     def __new__(cls, match, template, text):
-        if re.match(match, text, re.M) is None:
+        regex = patterns.compile(match, re.M).match(text)
+        if regex is None:
             return None
-        return super(HookedRegex, cls).__new__(cls)
+        self = super(HookedRegex, cls).__new__(cls)
+        self.regex = regex
+        return self
 
     def __init__(self, match, template, text):
         """Initialize the object as a clone of another regex, but add a hook
         to it this time.
 
+        The match itself is done once in __new__, which returns None
+        when text doesn't match.
+
         """
 
-        self.regex = re.match(match, text, re.M)
         self.template = template
 
     def __bool__(self):
@@ -0,0 +1,523 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Regenerate the boilerplate of a text as it is edited.
+
+An Analysis keeps what gen works out about a text: its blank line
+delimited segments (as in the stream module), the markers in each and
+the trigger matches of every piece of code and every generated region,
+counted by the number of pieces they are found in.  When the text is
+edited only the segments around the edits are split, tokenized and
+searched again, and a marker is only rendered again when its segment
+changed or when a trigger that the edit added or removed would change
+the set it sees.  Gen.gen's output is otherwise reproduced, with the
+same differences as the stream module's.
+
+Trigger regexes that might match across lines, such as Python Gen's,
+see all of the code at once, so while the text has a marker with one
+every update is a call to gen.  So is every update while a comment
+crosses into or out of a generated region, including one that the new
+output of a region opens.
+
+"""
+
+from bisect import bisect_right
+import io
+from .codeview import CodeView
+from . import patterns
+from .stream import _matches, _Stream
+from . import triggers
+
+
+class _Whole(Exception):
+
+    """Raised by Analysis._render when a new region makes a comment
+    cross a region's bounds, with the texts of the segments it changed
+    before that.
+
+    """
+
+    pass
+
+
+class _Marker(object):
+
+    """A marker in a segment and the state of its generated region.
+
+    c, e and end are the offsets in the segment of the start of its
+    comment, the end of its comment and the end of its region, match
+    is the HookedRegex, found the trigger matches of the region by
+    regex, keys the triggers it was last rendered with and unstable
+    whether generating the rest of the text since has changed what
+    gen would give it.
+
+    """
+
+    def __init__(self, c, e, end, match):
+        self.c, self.e, self.end, self.match = c, e, end, match
+        self.found = {}
+        self.keys = None
+        self.unstable = False
+
+
+class _Segment(object):
+
+    """A segment of the text, its markers and the trigger matches of
+    its code outside of their regions.
+
+    first is whether it was searched as the start of the text and
+    resplit whether generating it may have changed how it would be
+    split or tokenized.
+
+    """
+
+    def __init__(self, text, markers):
+        self.text = text
+        self.markers = markers
+        self.code = {}
+        self.first = False
+        self.resplit = False
+
+
+class Analysis(object):
+
+    """The boilerplate of a text, kept up to date as it is edited.
+
+    The text is generated when the analysis is made and again by each
+    call to update, which first applies a list of edits to it.  The
+    edits that generating made are left in edits each time.
+
+    """
+
+    def __init__(self, gen, text):
+        self.gen = gen
+        self._stream = _Stream(gen)
+        self.edits = self._build(text)
+
+    @property
+    def text(self):
+        """The current text."""
+
+        if self._segs is None:
+            return self._text
+        return ''.join(seg.text for seg in self._segs)
+
+    def _segment(self, text, line=1):
+        """Return a _Segment of text, which starts on line, with its
+        markers found.
+
+        """
+
+        return _Segment(text, [_Marker(*m)
+                               for m in self._stream.markers(text, line)])
+
+    def _segments(self, texts):
+        """Return the _Segments of the segment texts."""
+
+        out = []
+        line = 1
+        for t in texts:
+            out.append(self._segment(t, line))
+            line += t.count('\n')
+        return out
+
+    def _regex(self, rgx):
+        """Return the compiled trigger regex rgx, or None if it might
+        match across lines.
+
+        """
+
+        regex, bounded, _ = patterns.analyses.get(
+            rgx, lambda: triggers._compile(rgx))
+        return regex if bounded else None
+
+    def _crosses(self, seg):
+        """Return True if a comment in seg crosses the bounds of one of
+        its regions.
+
+        """
+
+        return self._stream.crosses(seg.text, [(mk.e, mk.end)
+                                               for mk in seg.markers])
+
+    def _find(self, code, first, regexes):
+        """Return the matches of each of regexes in code by their text.
+
+        """
+
+        return {rgx: _matches(self._regexes[rgx], code, first)
+                for rgx in regexes}
+
+    def _scan(self, seg, first, regexes):
+        """Find the matches of regexes in seg's code and regions."""
+
+        seg.first = first
+        view = CodeView(self.gen, seg.text)
+        for mk in reversed(seg.markers):
+            view.replace(mk.e, mk.end, '')
+        seg.code.update(self._find(view.text, first, regexes))
+        for mk in seg.markers:
+            region = CodeView(self.gen, seg.text[mk.e:mk.end]).text
+            mk.found.update(self._find(region, False, regexes))
+
+    def _add(self, found, n, touched):
+        """Count the matches in found n more times, noting the triggers
+        whose counts change in touched.
+
+        """
+
+        for rgx, ms in found.items():
+            counts = self._counts[rgx]
+            keys = touched.setdefault(rgx, {})
+            for k, m in ms.items():
+                c = counts.get(k)
+                counts[k] = [(c[0] if c else 0) + n, m]
+                keys.setdefault(k, None)
+
+    def _pieces(self, seg, n, touched):
+        """Count the matches of seg's code and regions n more times."""
+
+        self._add(seg.code, n, touched)
+        for mk in seg.markers:
+            self._add(mk.found, n, touched)
+
+    def _flipped(self, mk, keys):
+        """Return True if any of keys has come into or gone out of the
+        set of triggers that mk sees.
+
+        """
+
+        counts = self._counts[mk.match.match]
+        own = mk.found.get(mk.match.match, {})
+        for k in keys:
+            c = counts.get(k)
+            if (c is not None and c[0] - (k in own) > 0) != (k in mk.keys):
+                return True
+        return False
+
+    def _key(self, seg, mk):
+        """Return the comment and region of mk in seg."""
+
+        return mk.match.group(0), seg.text[mk.e:mk.end]
+
+    def _forget(self, seg, touched, carried):
+        """Take the pieces of seg out of the counts and keep the keys of
+        its stable markers in carried.
+
+        """
+
+        self._pieces(seg, -1, touched)
+        for mk in seg.markers:
+            if not mk.unstable and mk.keys is not None:
+                carried[self._key(seg, mk)] = mk.keys
+
+    def _joined(self, k):
+        """Return True if the kth segment no longer ends where a blank
+        line splits it from the next one.
+
+        """
+
+        segs = self._segs
+        if k + 1 == len(segs):
+            return False
+        a, b = segs[k].text, segs[k + 1].text
+        return (not (a.endswith('\n') and b.startswith('\n')) or
+                self._stream.joins(a, b))
+
+    def _moved(self, seg):
+        """Return True if the markers found in seg's text now aren't its
+        markers.
+
+        """
+
+        found = [(c, e, end, m.group(0))
+                 for (c, e, end, m) in self._stream.markers(seg.text)]
+        return found != [(mk.c, mk.e, mk.end, mk.match.group(0))
+                         for mk in seg.markers]
+
+    def _build(self, text):
+        """Analyse and generate text from scratch and return the edits.
+
+        """
+
+        try:
+            return self._analyse(text)
+        except BaseException:
+            self._segs = None
+            self._text = text
+            raise
+
+    def _analyse(self, text):
+        """Do the work of _build."""
+
+        segs = self._segments(self._stream.segments(io.StringIO(text)))
+        regexes = {mk.match.match for seg in segs for mk in seg.markers}
+        self._regexes = {rgx: self._regex(rgx) for rgx in regexes}
+        if (None in self._regexes.values() or
+                any(self._crosses(seg) for seg in segs if seg.markers)):
+            return self._whole(text)
+        self._segs = segs
+        self._counts = {rgx: {} for rgx in regexes}
+        for i, seg in enumerate(segs):
+            self._scan(seg, i == 0, regexes)
+            self._pieces(seg, 1, {})
+        return self._generate({mk for seg in segs for mk in seg.markers},
+                              {})
+
+    def _whole(self, text):
+        """Generate text with gen, leaving the analysis to do the same
+        on the next update, and return the edits.
+
+        """
+
+        self._segs = None
+        edits = []
+        self._text = self.gen.gen(text, edits=edits)
+        return edits
+
+    def _generate(self, dirty, touched):
+        """Return _render(dirty, touched), or generate the whole text with
+        gen if that turns out to be needed.
+
+        """
+
+        try:
+            return self._render(dirty, touched)
+        except _Whole as whole:
+            for seg, text in whole.args[0].items():
+                seg.text = text
+            return self._whole(self.text)
+
+    def _render(self, dirty, touched):
+        """Render the markers that are dirty or that see a different set
+        of triggers because of the triggers in touched, in order, and
+        return the edits.
+
+        """
+
+        from .gen import GenError
+
+        edits = []
+        saved = {}              # the texts of the segments changed
+        late = {}               # triggers touched by each marker
+        order = []
+        pos = 0
+        line = 1
+        for k, seg in enumerate(self._segs):
+            shift = 0
+            replaced = False
+            lines = seg.text.count('\n')
+            for i, mk in enumerate(seg.markers):
+                rgx = mk.match.match
+                order.append(mk)
+                if (mk not in dirty and not mk.unstable and
+                        not self._flipped(mk, touched.get(rgx, ()))):
+                    continue
+                counts = self._counts[rgx]
+                own = mk.found.get(rgx, {})
+                found = {k: c[1] for (k, c) in counts.items()
+                         if c[0] - (k in own) > 0}
+                try:
+                    new = ''.join(self.gen._render(mk.match, found))
+                except GenError as err:
+                    err.line = line + seg.text.count('\n', 0, mk.c)
+                    raise
+                mk.keys = frozenset(found)
+                mk.unstable = False
+                if new == seg.text[mk.e:mk.end]:
+                    continue
+                edits.append((pos + mk.e - shift, pos + mk.end - shift,
+                              new))
+                changed = {}
+                self._add(mk.found, -1, changed)
+                mk.found = self._find(CodeView(self.gen, new).text, False,
+                                      self._regexes)
+                self._add(mk.found, 1, changed)
+                for r, keys in changed.items():
+                    touched.setdefault(r, {}).update(keys)
+                late[len(order) - 1] = changed
+                saved.setdefault(seg, seg.text)
+                seg.text = seg.text[:mk.e] + new + seg.text[mk.end:]
+                delta = len(new) - (mk.end - mk.e)
+                mk.end += delta
+                for later in seg.markers[i + 1:]:
+                    later.c += delta
+                    later.e += delta
+                    later.end += delta
+                shift += delta
+                replaced = True
+                seg.resplit = seg.resplit or '\n\n' in new
+
+            # gen may split or tokenize the segment differently when
+            # it is run on the text again, in which case it is looked
+            # at again on the next update.
+            if replaced and self._crosses(seg):
+                raise _Whole(saved)
+            if replaced and not seg.resplit:
+                seg.resplit = self._moved(seg) or self._joined(k)
+            pos += len(seg.text) - shift
+            line += lines
+
+        # Regions generated after a marker aren't seen by it, but gen
+        # would see them when run on the text again.
+        for j, changed in late.items():
+            for mk in order[:j]:
+                keys = changed.get(mk.match.match)
+                if keys and not mk.unstable and self._flipped(mk, keys):
+                    mk.unstable = True
+        return edits
+
+    def update(self, edits):
+        """Apply the (start, end, new) edits to the text and generate it
+        again, returning the edits that makes.
+
+        The edits must be in order, not overlap and be in the offsets
+        of the current text.  The returned edits are in the offsets of
+        the edited text, as gen's are.  If generating raises an error
+        then the text is left as edited and the next update analyses
+        it from scratch.
+
+        """
+
+        text = self.text
+        for start, end, new in reversed(edits):
+            text = text[:start] + new + text[end:]
+        if self._segs is None:
+            self.edits = self._build(text)
+            return self.edits
+        try:
+            self.edits = self._update(edits)
+        except BaseException:
+            self._segs = None
+            self._text = text
+            raise
+        return self.edits
+
+    def _update(self, edits):
+        """Do the work of update for an analysed text."""
+
+        from .gen import GenError
+
+        segs = self._segs
+        starts = []
+        pos = 0
+        for seg in segs:
+            starts.append(pos)
+            pos += len(seg.text)
+
+        # The runs of segments to split again, each with a segment on
+        # either side in case a blank line is made or removed.
+        runs = []
+        for start, end, _ in edits:
+            runs.append((bisect_right(starts, start) - 2,
+                         bisect_right(starts, end)))
+        runs.extend((i - 1, i + 1) for (i, seg) in enumerate(segs)
+                    if seg.resplit)
+        merged = []
+        for a, b in sorted(runs):
+            a, b = max(a, 0), min(b, len(segs) - 1)
+            if merged and a <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], b)
+            else:
+                merged.append([a, b])
+
+        touched = {}
+        fresh = []
+        carried = {}
+        for a, b in reversed(merged):
+            lo = starts[a] if segs else 0
+            hi = starts[b] + len(segs[b].text) if segs else 0
+            text = ''.join(seg.text for seg in segs[a:b + 1])
+            for start, end, new in reversed(edits):
+                if lo <= start and end <= hi:
+                    text = text[:start - lo] + new + text[end - lo:]
+            for seg in segs[a:b + 1]:
+                self._forget(seg, touched, carried)
+            try:
+                texts = list(self._stream.segments(io.StringIO(text)))
+                # The last new segment may now take in the ones after it,
+                # such as when a C comment is opened and not closed.
+                while (b + 1 < len(segs) and
+                       self._stream.joins(texts[-1], segs[b + 1].text)):
+                    b += 1
+                    self._forget(segs[b], touched, carried)
+                    if segs[b] in fresh:
+                        fresh.remove(segs[b])
+                    text += segs[b].text
+                    texts = list(self._stream.segments(io.StringIO(text)))
+                new = self._segments(texts)
+            except GenError as err:
+                err.line += sum(seg.text.count('\n') for seg in segs[:a])
+                raise
+            segs[a:b + 1] = new
+            fresh.extend(new)
+
+        # A segment scanned as the first one must still be it.
+        for i, seg in enumerate(segs[:2]):
+            if seg not in fresh and seg.first != (i == 0):
+                self._pieces(seg, -1, touched)
+                seg.code.clear()
+                for mk in seg.markers:
+                    mk.found.clear()
+                fresh.append(seg)
+
+        regexes = {mk.match.match for seg in segs for mk in seg.markers}
+        added = regexes.difference(self._regexes)
+        for rgx in added:
+            self._regexes[rgx] = self._regex(rgx)
+            self._counts[rgx] = {}
+        if (None in self._regexes.values() or
+                any(self._crosses(seg) for seg in fresh if seg.markers)):
+            return self._build(self.text)
+        fresh = set(fresh)
+        for i, seg in enumerate(segs):
+            if seg in fresh:
+                self._scan(seg, i == 0, regexes)
+                self._pieces(seg, 1, touched)
+            elif added:
+                old = (seg.code, [mk.found for mk in seg.markers])
+                seg.code = {}
+                for mk in seg.markers:
+                    mk.found = {}
+                self._scan(seg, i == 0, added)
+                self._pieces(seg, 1, touched)
+                seg.code.update(old[0])
+                for mk, found in zip(seg.markers, old[1]):
+                    mk.found.update(found)
+        for rgx in set(self._regexes).difference(regexes):
+            del self._regexes[rgx]
+            del self._counts[rgx]
+            touched.pop(rgx, None)
+            for seg in segs:
+                seg.code.pop(rgx, None)
+                for mk in seg.markers:
+                    mk.found.pop(rgx, None)
+
+        # Markers that are only in a segment that was split again, with
+        # the same comment and region, keep the triggers they were
+        # rendered with.
+        dirty = set()
+        for seg in fresh:
+            for mk in seg.markers:
+                mk.keys = carried.pop(self._key(seg, mk), None)
+                if mk.keys is None:
+                    dirty.add(mk)
+        return self._generate(dirty, touched)
+
+
+__all__ = ['Analysis']
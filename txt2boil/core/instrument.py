@@ -0,0 +1,168 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Hooks that report where the time goes.
+
+Each phase of the work, such as chunking comments, dispatching
+matchComment, collecting triggers, rendering templates, running Python
+Gen code or reading and writing files, is reported to every function
+in hooks as
+
+    hook(phase, start, duration, info)
+
+where start is a time.perf_counter value, duration is in seconds and
+info is a dictionary of counts and sizes.  Phases that happen many
+times per call to gen, like chunking and matching, are reported once
+per call with their total duration and a count.
+
+Nothing is measured while hooks is empty, and the instrumented code
+only checks that once per call to gen.
+
+Each thread has hooks of its own, which only see the phases of the
+work done in that thread, so that jobs run at the same time in a
+thread pool are traced separately.
+
+"""
+
+import threading
+import time
+
+
+class _Hooks(threading.local):
+
+    """The functions called with every phase in the current thread.
+
+    """
+
+    def __init__(self):
+        self.funcs = []
+
+    def __bool__(self):
+        return bool(self.funcs)
+
+    def __iter__(self):
+        return iter(self.funcs)
+
+    def append(self, hook):
+        self.funcs.append(hook)
+
+    def remove(self, hook):
+        self.funcs.remove(hook)
+
+
+hooks = _Hooks()
+
+clock = time.perf_counter
+
+
+def addHook(hook):
+    """Call hook with every phase of this thread from now on."""
+
+    hooks.append(hook)
+
+
+def removeHook(hook):
+    """Stop calling hook."""
+
+    hooks.remove(hook)
+
+
+def emit(phase, start, duration, **info):
+    """Report a phase to all the hooks."""
+
+    for hook in list(hooks):
+        hook(phase, start, duration, info)
+
+
+class span(object):
+
+    """A context manager that reports the time spent in its body as
+    phase.
+
+    The info dictionary can be added to in the body.
+
+    """
+
+    def __init__(self, phase, **info):
+        self.phase = phase
+        self.info = info
+
+    def __enter__(self):
+        self.start = clock()
+        return self.info
+
+    def __exit__(self, *exc):
+        emit(self.phase, self.start, clock() - self.start, **self.info)
+
+
+class Phase(object):
+
+    """The total time and number of calls spent in a phase that is
+    entered many times.
+
+    """
+
+    def __init__(self, phase):
+        self.phase = phase
+        self.start = None
+        self.duration = 0.0
+        self.count = 0
+
+    def _add(self, t, n=1):
+        if self.start is None:
+            self.start = t
+        self.duration += clock() - t
+        self.count += n
+
+    def wrap(self, func):
+        """Return func, timed as part of this phase."""
+
+        def timed(*args, **kwargs):
+            t = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._add(t)
+        return timed
+
+    def iterate(self, iterable):
+        """Yield the items of iterable, timing each step as part of this
+        phase.
+
+        """
+
+        it = iter(iterable)
+        while True:
+            t = clock()
+            try:
+                item = next(it)
+            except StopIteration:
+                self._add(t, 0)
+                return
+            self._add(t)
+            yield item
+
+    def emit(self, **info):
+        """Report the phase, if it was entered at all."""
+
+        if self.count:
+            emit(self.phase, self.start, self.duration, count=self.count,
+                 **info)
+
+
+__all__ = ['hooks', 'addHook', 'removeHook', 'emit', 'span', 'Phase']
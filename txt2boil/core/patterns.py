@@ -0,0 +1,108 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""A process-wide registry of compiled regexes.
+
+The re module only keeps a small cache of compiled patterns, which a
+large batch of trigger regexes quickly thrashes.  Everything in
+txt2boil compiles its marker and trigger regexes through the registry
+here instead.
+
+The analyses of trigger regexes made by the triggers module are kept
+in a registry of their own, analyses, so that they neither evict
+compiled patterns nor count towards their hits and misses.
+
+"""
+
+from collections import OrderedDict
+import re
+import threading
+
+
+class PatternRegistry(object):
+
+    """A bounded, least recently used cache of compiled regexes.
+
+    The hits, misses and evictions counters record how well the cache
+    is being reused.
+
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = self.misses = self.evictions = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        """Return the entry for key, calling build to make it if it isn't
+        in the cache.
+
+        """
+
+        with self._lock:
+            try:
+                value = self._cache.pop(key)
+            except KeyError:
+                pass
+            else:
+                self.hits += 1
+                self._cache[key] = value
+                return value
+        value = build()
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = value
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def compile(self, pattern, flags=0):
+        """Return pattern compiled with flags."""
+
+        return self.get((pattern, flags),
+                        lambda: re.compile(pattern, flags))
+
+    def stats(self):
+        """Return a dictionary of the registry's counters."""
+
+        with self._lock:
+            return {'size': len(self._cache), 'maxsize': self.maxsize,
+                    'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions}
+
+    def clear(self):
+        """Empty the cache and reset the counters."""
+
+        with self._lock:
+            self._cache.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+registry = PatternRegistry()
+analyses = PatternRegistry()
+
+
+def compile(pattern, flags=0):
+    """Return pattern compiled with flags through the registry."""
+
+    return registry.compile(pattern, flags)
+
+
+__all__ = ['PatternRegistry', 'registry', 'analyses', 'compile']
@@ -0,0 +1,106 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""A scanner that walks through a text's matches in a single pass.
+
+"""
+
+
+class _Scanner(object):
+
+    """Merge the matches of several search functions in a single pass.
+
+    Each function has the same signature as Extractor.lineComment and
+    is expected to return the leftmost match at or after start.  The
+    next match of every function is cached until the scan moves past
+    it, so each function only ever searches forward and the whole
+    text is read once regardless of how many matches there are.
+
+    """
+
+    def __init__(self, text, finders, start=0):
+        self.text = text
+        self.finders = finders
+        self.pos = start
+        self._next = [None] * len(finders)
+        self._origin = [-1] * len(finders)
+        self._out = []          # the output up to _done, in pieces
+        self._done = 0
+
+    def _refresh(self):
+        """Search again with every function whose cached match has been
+        passed by the scan.
+
+        """
+
+        for i, find in enumerate(self.finders):
+            span = self._next[i]
+            if self._origin[i] < 0 or (span and span[0] < self.pos):
+                m = find(self.text, self.pos)
+                self._next[i] = m.span() if m else None
+                self._origin[i] = self.pos
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        """Return the (start, end, kind) of the next match.
+
+        The kind is the index of the function that found it.  Ties are
+        won by the function listed first and the scan resumes one
+        character after the start of the match, exactly as repeated
+        calls to Extractor.nextComment would.
+
+        """
+
+        self._refresh()
+        n = len(self.text)
+        kind = min(range(len(self.finders)),
+                   key=lambda i: self._next[i][0] if self._next[i] else n)
+        span = self._next[kind]
+        if span is None:
+            raise StopIteration
+        self.pos = span[0] + 1
+        return span[0], span[1], kind
+
+    next = __next__
+
+    def replace(self, start, end, new):
+        """Replace text[start:end] with new in the output and resume the
+        scan at end.
+
+        The text itself isn't changed, so offsets are always those of
+        the original text and the cached matches past the region stay
+        as they are.  The output is only joined by result.  Searches
+        after the region see its last character rather than new's,
+        which makes no difference to searches that don't look back or
+        when both are newlines.
+
+        """
+
+        self._out.append(self.text[self._done:start])
+        self._out.append(new)
+        self._done = end
+        self.pos = end
+
+    def result(self):
+        """Return the text with every replacement made."""
+
+        if not self._out:
+            return self.text
+        return ''.join(self._out) + self.text[self._done:]
@@ -0,0 +1,316 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Generate boilerplate in a stream of text a segment at a time.
+
+The text is split into segments at its blank lines, the same
+boundaries that end generated regions, so every marker's region lies
+in the segment of its comment.  A segment is only extended past a
+blank line when a comment crosses it.
+
+The stream is read three times: once to find the markers, once to
+collect the trigger matches of their regexes, and once to write each
+segment as it is finished.  Only the current segment, the markers and
+the trigger matches (each kept with its own line of code) are held in
+memory.  Input that can't be read again, such as a pipe, is spooled to
+a temporary file first.
+
+Three things differ from Gen.gen.  Chunks never extend past a segment,
+which only matters for block comments separated by blank lines.
+Trigger regexes that might match across lines, such as Python Gen's,
+need all of the code at once, so when a marker has one the whole text
+is read and handed to gen instead.  The same goes for a comment that
+crosses into or out of a generated region, since then the code can't
+be searched apart from the regions.  The check is made on the text as
+it is read, so a region whose new output leaves such a comment open
+is the third difference.
+
+"""
+
+from bisect import bisect_right
+from .codeview import CodeView
+from . import patterns
+from .scanner import _Scanner
+from . import triggers
+
+
+def _split(f, size):
+    """Yield the pieces of the text read from f, each ending right after
+    the first newline of a blank line.
+
+    """
+
+    buf, pos = '', 0
+    while True:
+        data = f.read(size)
+        if not data:
+            break
+        buf += data
+        start = 0
+        i = buf.find('\n\n', pos)
+        while i != -1:
+            yield buf[start:i + 1]
+            start = i + 1
+            i = buf.find('\n\n', start)
+        buf = buf[start:]
+        pos = max(0, len(buf) - 1)
+    if buf:
+        yield buf
+
+
+def _matches(regex, code, first):
+    """Return a dictionary of the matches of the line bounded regex in
+    code by their text.
+
+    Each match is made again against only its own line, so that it
+    doesn't keep the rest of code alive.  Unless code is the first
+    piece of the text, it is searched as if it followed a newline.
+
+    """
+
+    prefix = '' if first else '\n'
+    text = prefix + code
+    out = {}
+    for m in regex.finditer(text, len(prefix)):
+        ls = text.rfind('\n', 0, m.start()) + 1
+        le = text.find('\n', m.end())
+        le = len(text) if le < 0 else le + 1
+        if ls == 0:
+            small = regex.match(text[:le], m.start())
+        else:
+            small = regex.match('\n' + text[ls:le], m.start() - ls + 1)
+        if small is None or small.group(0) != m.group(0):
+            small = m
+        out[m.group(0)] = small
+    return out
+
+
+class _Stream(object):
+
+    """Run a generator over a stream of text.
+
+    """
+
+    def __init__(self, gen, size=1 << 16):
+        self.gen = gen
+        self.size = size
+
+    def _straddles(self, a, b):
+        """Return True if a comment starts in a and ends in b."""
+
+        text = a + b
+        for s, e, _ in _Scanner(text, self.gen._codeFinders(), 0):
+            if s >= len(a):
+                return False
+            if e > len(a):
+                return True
+        return False
+
+    def _unresolved(self, a, b):
+        """Return True if a search for a comment starting in a might read
+        past the end of b, so that the text after b could still make a
+        comment that crosses from a into b.
+
+        """
+
+        horizon = self.gen._horizon()
+        text = a + b
+        return horizon is None or horizon(text, len(a)) >= len(text)
+
+    def joins(self, a, b):
+        """Return True if the first piece of b is added to the segment a.
+
+        """
+
+        i = b.find('\n\n')
+        piece = b if i < 0 else b[:i + 1]
+        return self._straddles(a, piece) or self._unresolved(a, piece)
+
+    def segments(self, f):
+        """Yield the segments of the text read from f.
+
+        A piece is added to the segment before it while a comment
+        crosses into it, or might once more of the text is read, such
+        as when a C comment hasn't been closed yet.
+
+        """
+
+        pending = None
+        for piece in _split(f, self.size):
+            if pending is not None and self.joins(pending, piece):
+                pending += piece
+                continue
+            if pending is not None:
+                yield pending
+            pending = piece
+        if pending is not None:
+            yield pending
+
+    def crosses(self, seg, regions):
+        """Return True if a comment in seg crosses the start or end of
+        one of the (start, end) regions.
+
+        """
+
+        bounds = sorted({b for region in regions for b in region})
+        if not bounds:
+            return False
+        for s, e, _ in _Scanner(seg, self.gen._codeFinders(), 0):
+            i = bisect_right(bounds, s)
+            if i < len(bounds) and bounds[i] < e:
+                return True
+        return False
+
+    def markers(self, seg, line=1):
+        """Return the (chunk start, end, region end, match) of each
+        marker in seg, as Gen.gen would find them.
+
+        line is the line of the text that seg starts on, which is
+        given to any GenError raised.
+
+        """
+
+        from .gen import GenError
+        gen = self.gen
+        out = []
+        if not gen.mayBeMarked(seg):
+            return out
+        pos = 0
+        while True:
+            scanner = _Scanner(seg, gen._commentFinders(), pos)
+            for chunk in gen._chunks(scanner):
+                cc = [p for (_, _, p) in chunk]
+                m = gen.route(gen.extractChunkContent(cc))
+                if m:
+                    break
+            else:
+                return out
+            try:
+                e = gen.chunkEnd(chunk)
+            except GenError as err:
+                err.line = line + seg.count('\n', 0, chunk[0][0])
+                raise
+            end = gen.regionEnd(seg, e)
+            out.append((chunk[0][0], e, end, m))
+            pos = end
+
+    def run(self, infile, outfile):
+        """Write the text read from infile, filled with autogenerated
+        code, to outfile.
+
+        """
+
+        if not infile.seekable():
+            import tempfile
+            spool = tempfile.TemporaryFile('w+', encoding='utf-8',
+                                           errors='surrogateescape')
+            try:
+                while True:
+                    data = infile.read(self.size)
+                    if not data:
+                        break
+                    spool.write(data)
+                spool.seek(0)
+                return self.run(spool, outfile)
+            finally:
+                spool.close()
+        origin = infile.tell()
+
+        # Find the markers, by the index of their segment.
+        markers = {}
+        whole = False
+        line = 1
+        for i, seg in enumerate(self.segments(infile)):
+            found = self.markers(seg, line)
+            if found:
+                markers[i] = found
+                whole = whole or self.crosses(
+                    seg, [(e, end) for (_, e, end, _) in found])
+            line += seg.count('\n')
+        infile.seek(origin)
+        if not markers:
+            for seg in self.segments(infile):
+                outfile.write(seg)
+            return
+
+        regexes = {}
+        for found in markers.values():
+            for _, _, _, m in found:
+                regex, bounded, _ = patterns.analyses.get(
+                    m.match, lambda: triggers._compile(m.match))
+                whole = whole or not bounded
+                regexes[m.match] = regex
+        if whole:
+            outfile.write(self.gen.gen(infile.read()))
+            return
+
+        # Count the pieces of code that each trigger is found in,
+        # keeping the regions' own matches so that they can be taken
+        # out again when the regions are replaced.
+        combined = {rgx: {} for rgx in regexes}
+        regions = []
+
+        def add(found, n):
+            for rgx, ms in found.items():
+                counts = combined[rgx]
+                for k, m in ms.items():
+                    c = counts.get(k)
+                    counts[k] = [(c[0] if c else 0) + n, m]
+
+        def find(code, first):
+            return {rgx: _matches(regex, code, first)
+                    for (rgx, regex) in regexes.items()}
+
+        first = True
+        for i, seg in enumerate(self.segments(infile)):
+            view = CodeView(self.gen, seg)
+            for _, e, end, _ in reversed(markers.get(i, [])):
+                view.replace(e, end, '')
+            add(find(view.text, first), 1)
+            for _, e, end, _ in markers.get(i, []):
+                found = find(CodeView(self.gen, seg[e:end]).text, False)
+                add(found, 1)
+                regions.append(found)
+            first = False
+        infile.seek(origin)
+
+        # Write each segment with its regions generated.
+        from .gen import GenError
+        k = 0
+        line = 1
+        for i, seg in enumerate(self.segments(infile)):
+            out = []
+            pos = 0
+            for c, e, end, m in markers.get(i, []):
+                add(regions[k], -1)
+                counts = combined[m.match]
+                found = {key: v[1] for (key, v) in counts.items()
+                         if v[0] > 0}
+                try:
+                    new = ''.join(self.gen._render(m, found))
+                except GenError as err:
+                    err.line = line + seg.count('\n', 0, c)
+                    raise
+                add(find(CodeView(self.gen, new).text, False), 1)
+                out.append(seg[pos:e])
+                out.append(new)
+                pos = end
+                k += 1
+            out.append(seg[pos:])
+            outfile.write(''.join(out))
+            line += seg.count('\n')
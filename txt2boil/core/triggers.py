@@ -0,0 +1,293 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""An index of the trigger matches in a CodeView's stripped text.
+
+Whether a trigger regex stays within a line is worked out from the re
+module's private parser.  If it is missing, or its output isn't what
+is expected, every regex is treated as crossing lines, which is always
+correct but searches the whole text again on every edit.
+
+"""
+
+from . import patterns
+import re
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    try:
+        import sre_parse
+    except ImportError:
+        sre_parse = None
+
+_C = sre_parse
+
+# Character class members that can never match a newline.
+try:
+    _safeCategories = {_C.CATEGORY_DIGIT, _C.CATEGORY_WORD,
+                       _C.CATEGORY_NOT_SPACE}
+except AttributeError:
+    _safeCategories = set()
+
+
+def _crossesLines(data, flags):
+    """Return true if the parsed pattern data might match or look past a
+    newline.
+
+    This errs on the side of caution: anything that isn't understood
+    is assumed to cross lines.
+
+    """
+
+    for op, av in data:
+        if op is _C.LITERAL:
+            if av == ord('\n'):
+                return True
+        elif op is _C.NOT_LITERAL:
+            if av != ord('\n'):
+                return True
+        elif op is _C.ANY:
+            if flags & re.S:
+                return True
+        elif op is _C.IN:
+            for iop, iav in av:
+                if ((iop is _C.LITERAL and iav == ord('\n')) or
+                        iop is _C.NEGATE or
+                        (iop is _C.RANGE and iav[0] <= ord('\n') <= iav[1]) or
+                        (iop is _C.CATEGORY and
+                         iav not in _safeCategories)):
+                    return True
+        elif op is _C.AT:
+            if av is _C.AT_END_STRING or (av is _C.AT_END and
+                                          not flags & re.M):
+                return True
+        elif op is _C.SUBPATTERN:
+            if (len(av) > 2 and av[1] & re.S or
+                    _crossesLines(av[-1], flags)):
+                return True
+        elif op in (_C.MAX_REPEAT, _C.MIN_REPEAT):
+            if _crossesLines(av[2], flags):
+                return True
+        elif op is _C.BRANCH:
+            if any(_crossesLines(b, flags) for b in av[1]):
+                return True
+        else:
+            return True
+    return False
+
+
+def _analyse(rgx):
+    """Return whether rgx stays within a line and the plain string it
+    matches, if any.
+
+    """
+
+    parsed = sre_parse.parse(rgx)
+    flags = parsed.state.flags
+    literal = None
+    if (parsed.data and not flags & re.I and
+            all(op is _C.LITERAL for (op, _) in parsed.data)):
+        literal = ''.join(chr(c) for (_, c) in parsed.data)
+    return not _crossesLines(parsed.data, flags), literal
+
+
+def _compile(rgx):
+    """Return the compiled rgx, whether it stays within a line and the
+    plain string it matches, if any.
+
+    Any failure to analyse rgx falls back to treating it as crossing
+    lines with no plain string.
+
+    """
+
+    regex = patterns.compile(rgx)
+    try:
+        bounded, literal = _analyse(rgx)
+    except Exception:
+        bounded, literal = False, None
+    return regex, bounded, literal
+
+
+class _Triggers(object):
+
+    """The matches of one trigger regex, in order.
+
+    Like CodeView, the matches are split around a gap at the last
+    edit, and those after it are stored relative to an offset.  The
+    matches of each string are also kept on either side of the gap,
+    so that the table of the last match of every string can be
+    updated with just the matches an edit removes and adds.
+
+    """
+
+    def __init__(self, rgx, text):
+        self.regex, self.bounded, self.literal = patterns.analyses.get(
+            rgx, lambda: _compile(rgx))
+        self._reset(text)
+
+    def _reset(self, text):
+        """Find every match in text, forgetting any found before."""
+
+        self._head, self._tail, self._delta = [], [], 0
+        self._heads, self._tails, self._table = {}, {}, {}
+        self._push(self._find(text, 0, len(text)))
+
+    def _find(self, text, pos, endpos, base=0):
+        """Yield the (start, match) of every match in text[pos:endpos],
+        where text starts at base in the stripped text.
+
+        Plain strings are found with str.find rather than by the regex
+        engine.
+
+        """
+
+        if self.literal is None:
+            for m in self.regex.finditer(text, pos, endpos):
+                yield base + m.start(), m
+            return
+        lit = self.literal
+        i = text.find(lit, pos, endpos)
+        while i >= 0:
+            yield base + i, self.regex.match(text, i)
+            i = text.find(lit, i + len(lit), endpos)
+
+    def _push(self, found):
+        """Add the (start, match) pairs in found, which follow every match
+        before the gap, to those before it.
+
+        """
+
+        for i, m in found:
+            k = m.group(0)
+            self._head.append((i, m))
+            self._heads.setdefault(k, []).append(m)
+            if not self._tails.get(k):
+                self._table[k] = m
+
+    def _settle(self, k):
+        """Point the table at the last match of the string k, now that
+        one of its matches has been removed.
+
+        """
+
+        if self._tails.get(k):
+            self._table[k] = self._tails[k][0]
+        elif self._heads.get(k):
+            self._table[k] = self._heads[k][-1]
+        else:
+            self._table.pop(k, None)
+            self._heads.pop(k, None)
+            self._tails.pop(k, None)
+
+    def edit(self, view, x, y, n):
+        """Update the matches for the view's old stripped text[x:y] being
+        replaced by text[x:x + n].
+
+        When the regex can't cross a line only the lines touched by
+        the edit are searched again, in a copy of just those lines and
+        the newline before them.  Otherwise the whole text is.
+
+        """
+
+        if not self.bounded:
+            self._reset(view.text)
+            return
+
+        lo = view.lineStart(x)
+        hi = view.lineEnd(x + n)
+        d = n - (y - x)
+
+        # Move the gap to the start of the first edited line.
+        while self._head and self._head[-1][0] >= lo:
+            i, m = self._head.pop()
+            k = m.group(0)
+            self._heads[k].pop()
+            self._tail.append((i - self._delta, m))
+            self._tails.setdefault(k, []).append(m)
+        while self._tail and self._tail[-1][0] + self._delta < lo:
+            i, m = self._tail.pop()
+            k = m.group(0)
+            self._tails[k].pop()
+            self._head.append((i + self._delta, m))
+            self._heads.setdefault(k, []).append(m)
+
+        # Drop the matches on the edited lines and find them again.
+        while self._tail and self._tail[-1][0] + self._delta <= hi - d:
+            k = self._tail.pop()[1].group(0)
+            self._tails[k].pop()
+            self._settle(k)
+        self._delta += d
+        base = max(lo - 1, 0)
+        lines = view.span(base, hi + 1)
+        self._push(self._find(lines, lo - base, len(lines), base))
+        while self._head and self._head[-1][0] > hi:
+            k = self._head.pop()[1].group(0)
+            self._heads[k].pop()
+            self._settle(k)
+
+    def table(self):
+        """Return a dictionary of every matched string and its last match.
+
+        The dictionary is updated in place as the view is edited.
+
+        """
+
+        return self._table
+
+
+class TriggerIndex(object):
+
+    """The matches of every trigger regex looked up in a CodeView.
+
+    Each distinct regex is searched for when it is first looked up,
+    and its matches are then kept up to date as the view is edited, so
+    markers that share a trigger share its matches.  A regex that
+    hasn't been looked up for keep edits is forgotten rather than
+    updated, so that files where every marker has its own trigger
+    don't pay for all of them on every edit.
+
+    """
+
+    keep = 16
+
+    def __init__(self, view):
+        self.view = view
+        self._triggers = {}
+        self._clock = 0
+        view.listeners.append(self._edit)
+
+    def _edit(self, x, y, n):
+        self._clock += 1
+        for rgx, t in list(self._triggers.items()):
+            if self._clock - t.used > self.keep:
+                del self._triggers[rgx]
+            else:
+                t.edit(self.view, x, y, n)
+
+    def collect(self, rgx):
+        """Return a dictionary of the strings matching rgx in the view's
+        text and their corresponding matches.
+
+        """
+
+        if rgx not in self._triggers:
+            self._triggers[rgx] = _Triggers(rgx, self.view.text)
+        t = self._triggers[rgx]
+        t.used = self._clock
+        return t.table()
@@ -0,0 +1,423 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Finding, reading and writing source files.
+
+"""
+
+import codecs
+import contextlib
+import fnmatch
+import functools
+import locale
+import mmap
+import os
+import re
+import stat
+
+
+# Directories that are never descended into.
+skipDirs = {'.git', '.hg', '.svn', '.bzr', 'CVS', '__pycache__'}
+
+# The ignore files read in every directory by default.
+ignoreFiles = ['.txt2boilignore']
+
+
+@contextlib.contextmanager
+def _replacing(fname):
+    """Yield the descriptor of a temporary file that replaces fname once
+    the block is done with it.
+
+    Symbolic links are followed, so it is the file they point to that
+    is replaced.  The temporary file is in that file's directory and
+    given its permission bits and, where allowed, its owner and group
+    before it is renamed over it, so readers never see a partially
+    written file.  A file with other hard links is overwritten with
+    the finished temporary file instead, since renaming over it would
+    split it from them.
+
+    """
+
+    import shutil
+    import tempfile
+
+    fname = os.path.realpath(fname)
+    st = os.stat(fname)
+    dname, bname = os.path.split(fname)
+    fd, tmp = tempfile.mkstemp(dir=dname, prefix='.' + bname + '.')
+    try:
+        yield fd
+        if st.st_nlink > 1:
+            with open(tmp, 'rb') as src, open(fname, 'r+b') as dst:
+                shutil.copyfileobj(src, dst)
+                dst.truncate()
+            os.unlink(tmp)
+            return
+        if hasattr(os, 'chown'):
+            try:
+                os.chown(tmp, st.st_uid, st.st_gid)
+            except OSError:
+                pass
+        os.chmod(tmp, stat.S_IMODE(st.st_mode))
+        os.replace(tmp, fname)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def replace(fname, text, encoding=None):
+    """Atomically replace the contents of fname with text.
+
+    """
+
+    with _replacing(fname) as fd:
+        with os.fdopen(fd, 'w', encoding=encoding) as f:
+            f.write(text)
+
+
+def splice(fname, data, edits, encoding=None):
+    """Atomically replace the contents of fname with data, with each
+    data[start:end] replaced by new for the (start, end, new) triples
+    in edits.
+
+    The edits must be in order and their offsets are byte offsets.
+    The rest of data is written as it is, straight from its buffer, so
+    only the new text is ever encoded.
+
+    """
+
+    enc = codecs.getincrementalencoder(_encoding(encoding))()
+    view = memoryview(data)
+    with _replacing(fname) as fd:
+        with os.fdopen(fd, 'wb') as f:
+            pos = 0
+            for start, end, new in edits:
+                f.write(view[pos:start])
+                f.write(enc.encode(new))
+                pos = end
+            f.write(view[pos:])
+            f.write(enc.encode('', True))
+
+
+@contextlib.contextmanager
+def mapped(fname):
+    """Yield the contents of fname as a read only buffer.
+
+    The file is memory-mapped where it can be and read otherwise.
+
+    """
+
+    with open(fname, 'rb') as f:
+        try:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, EnvironmentError, mmap.error):
+            yield f.read()
+            return
+    with m:
+        yield m
+
+
+# Bytes that stop a buffer's text from being decoded byte for byte.
+_unplain = re.compile(br'[\r\x80-\xff]')
+
+
+def _encoding(encoding):
+    """Return the encoding that open would use for encoding."""
+
+    return encoding or locale.getpreferredencoding(False)
+
+
+@functools.lru_cache(None)
+def _asciiCompatible(encoding):
+    """Return True if ASCII text is encoded byte for byte by encoding.
+
+    Encodings that write a byte order mark, such as utf-8-sig, aren't,
+    since an incremental encoder would write it before the first text
+    it is given.
+
+    """
+
+    low = bytes(range(128))
+    try:
+        return (low.decode(encoding) == low.decode('ascii') and
+                low.decode('ascii').encode(encoding) == low)
+    except (UnicodeError, LookupError):
+        return False
+
+
+# The byte order marks that the encodings writing one may start a file
+# with, and the encodings of the text after each.
+_boms = {
+    'utf-8-sig': [(codecs.BOM_UTF8, 'utf-8'), (b'', 'utf-8')],
+    'utf-16': [(codecs.BOM_UTF16_LE, 'utf-16-le'),
+               (codecs.BOM_UTF16_BE, 'utf-16-be')],
+    'utf-32': [(codecs.BOM_UTF32_LE, 'utf-32-le'),
+               (codecs.BOM_UTF32_BE, 'utf-32-be')],
+}
+
+
+def _bomless(encoding, head):
+    """Return the encoding of the text after the byte order mark of the
+    file that starts with the bytes head, or None if it is unknown.
+
+    Encodings that don't write a byte order mark are returned as they
+    are.
+
+    """
+
+    if not ''.encode(encoding):
+        return encoding
+    for bom, enc in _boms.get(codecs.lookup(encoding).name, []):
+        if head.startswith(bom):
+            return enc
+    return None
+
+
+def decode(data, encoding=None):
+    """Return the text of the buffer data, as open would read it, and
+    whether the text's offsets are also offsets into data.
+
+    They are whenever data is plain ASCII without carriage returns,
+    the encoding agrees with ASCII and newlines are written as they
+    are read, which is checked with a single search of data.  Then
+    the text can be written back with splice.
+
+    """
+
+    enc = _encoding(encoding)
+    if (os.linesep == '\n' and _asciiCompatible(enc) and
+            _unplain.search(data) is None):
+        return str(data, 'ascii'), True
+    text = str(data, enc)
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text, False
+
+
+class _Ignore(object):
+
+    """The rules of one ignore file.
+
+    The format is a subset of .gitignore: blank lines and lines
+    starting with # are skipped, a leading ! re-includes what an
+    earlier rule excluded, a trailing / only matches directories and a
+    pattern containing a / is matched against the path relative to the
+    ignore file rather than the base name.
+
+    """
+
+    def __init__(self, lines):
+        self.rules = []
+        for line in lines:
+            line = line.rstrip('\n').rstrip()
+            if not line or line.startswith('#'):
+                continue
+            negate = line.startswith('!')
+            if negate:
+                line = line[1:]
+            dironly = line.endswith('/')
+            line = line.rstrip('/')
+            anchored = '/' in line
+            line = line.lstrip('/')
+            regex = re.compile(fnmatch.translate(line)).match
+            self.rules.append((regex, negate, dironly, anchored))
+
+    def match(self, path, isdir):
+        """Return whether the rules exclude path, or None if no rule
+        matches it.
+
+        """
+
+        result = None
+        name = path.rpartition('/')[2]
+        for regex, negate, dironly, anchored in self.rules:
+            if dironly and not isdir:
+                continue
+            if regex(path if anchored else name):
+                result = not negate
+        return result
+
+
+def _ignore(dname, names):
+    """Return the _Ignore of the first ignore file in dname, or None.
+
+    """
+
+    for name in names:
+        try:
+            with open(os.path.join(dname, name)) as f:
+                return _Ignore(f)
+        except (IOError, OSError):
+            pass
+    return None
+
+
+def _excluded(rules, path, isdir):
+    """Return True if the (base, _Ignore) pairs in rules exclude path.
+
+    """
+
+    excluded = None
+    for base, rule in rules:
+        rel = os.path.relpath(path, base).replace(os.sep, '/')
+        m = rule.match(rel, isdir)
+        if m is not None:
+            excluded = m
+    return bool(excluded)
+
+
+def walk(top, exts, ignore=None, dirs=False):
+    """Yield the files under the directory top whose extension is in
+    exts.
+
+    The files in a directory are yielded in sorted order before those
+    in its subdirectories.  Entries excluded by an ignore file named
+    in ignore, in their directory or any directory above it up to top,
+    are skipped.  ignore defaults to ignoreFiles.  If dirs is True then
+    the directories that would be searched, starting with top, are
+    yielded instead of the files.
+
+    Symbolic links to directories are followed, but a directory that
+    has already been searched, such as one a link loops back to, is
+    not searched again.
+
+    """
+
+    if ignore is None:
+        ignore = ignoreFiles
+    stack = [(top, [])]
+    seen = set()
+    while stack:
+        dname, rules = stack.pop()
+        try:
+            st = os.stat(dname)
+        except OSError:
+            continue
+        if (st.st_dev, st.st_ino) in seen:
+            continue
+        seen.add((st.st_dev, st.st_ino))
+        if dirs:
+            yield dname
+        rule = _ignore(dname, ignore)
+        if rule is not None:
+            rules = rules + [(dname, rule)]
+        try:
+            with os.scandir(dname) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs = []
+        for e in entries:
+            try:
+                isdir = e.is_dir()
+            except OSError:
+                continue
+            if isdir and e.name in skipDirs:
+                continue
+            if not isdir and (dirs or
+                              os.path.splitext(e.name)[1] not in exts):
+                continue
+            if _excluded(rules, e.path, isdir):
+                continue
+            if isdir:
+                subdirs.append((e.path, rules))
+            else:
+                yield e.path
+        stack.extend(reversed(subdirs))
+
+
+def accepts(top, path, exts, ignore=None, isdir=False):
+    """Return True if walk(top, exts, ignore) would yield the file path,
+    or search it if isdir is True.
+
+    """
+
+    if ignore is None:
+        ignore = ignoreFiles
+    if not isdir and os.path.splitext(path)[1] not in exts:
+        return False
+    parts = os.path.relpath(path, top).split(os.sep)
+    if parts[0] == os.pardir:
+        return False
+    if parts == [os.curdir]:
+        return isdir
+    dname, rules = top, []
+    for i, part in enumerate(parts):
+        d = isdir or i + 1 < len(parts)
+        if d and part in skipDirs:
+            return False
+        rule = _ignore(dname, ignore)
+        if rule is not None:
+            rules.append((dname, rule))
+        dname = os.path.join(dname, part)
+        if _excluded(rules, dname, d):
+            return False
+    return True
+
+
+def contains(fname, words, encoding=None):
+    """Return True if the file fname may contain any of words.
+
+    The file is memory-mapped and searched for the words encoded with
+    encoding, which defaults to open's, so it isn't decoded.  For
+    encodings that write a byte order mark the words are encoded
+    without one, as the text after the file's mark is.  Files that
+    can't be mapped, or whose mark is missing, are assumed to contain
+    them.
+
+    """
+
+    enc = _encoding(encoding)
+    with open(fname, 'rb') as f:
+        try:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return False        # an empty file
+        except (EnvironmentError, mmap.error):
+            return True
+    with m:
+        enc = _bomless(enc, m[:4])
+        if enc is None:
+            return True
+        return any(m.find(w.encode(enc)) != -1 for w in words)
+
+
+def readList(f, sep='\0', size=1 << 16):
+    """Yield the sep separated names read from the file object f.
+
+    The file is read in pieces of size characters, so the list can be
+    arbitrarily long.
+
+    """
+
+    rest = ''
+    while True:
+        data = f.read(size)
+        if not data:
+            break
+        names = (rest + data).split(sep)
+        rest = names.pop()
+        for name in names:
+            if name:
+                yield name
+    if rest:
+        yield rest
+
+
+__all__ = ['replace', 'splice', 'mapped', 'decode', 'walk', 'accepts',
+           'contains', 'readList']
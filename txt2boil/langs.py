@@ -58,6 +58,10 @@ class _RacketConstantGen(GenericGen):
 
     """
 
+    @cmi.unionCMI(lambda: _RacketConstantGen)
+    def markers(self):
+        return {'Constant Gen:'}
+
     @cmi.nonNoneCMI(lambda: _RacketConstantGen)
     def matchComment(self, comm):
         return HookedRegex(r'Constant Gen: (\S+) (.*)\n',
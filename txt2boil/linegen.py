@@ -25,6 +25,10 @@ class LineCodeGen(Gen):
 
     """
 
+    @cmi.unionCMI(lambda: LineCodeGen)
+    def markers(self):
+        return {'Line Gen:'}
+
     @cmi.nonNoneCMI(lambda: LineCodeGen)
     def matchComment(self, comm):
         return HookedRegex(r'Line Gen:\n(.+)\n(.+)\n',
@@ -17,13 +17,315 @@
 
 """A generator that uses python code to generate its output.
 
+The code in a Python Gen comment is compiled once and the resulting
+code object is marshalled into a cache directory, much like
+__pycache__, so that later runs don't have to compile it again.  The
+cache is keyed by a hash of the code and the interpreter's cache tag,
+and can be moved by setting cacheDir (or TXT2BOIL_PYCACHE in the
+environment) or disabled by setting it to None.  Since loading a code
+object runs whatever it holds, a cache directory that isn't owned by
+the user, or that others can write to, is never used.
+
+Setting executor to a PyGenPool runs the code in worker processes
+instead, with a time limit on each snippet.
+
+The modules that are only needed once Python Gen code is found are
+imported when they are first used, since every language loads this
+module.
+
 """
 
-import textwrap
+import collections
+import marshal
+import os
+import stat
+import sys
 from .core import *
+from .core import instrument
+from .core.scanner import _Scanner
 from . import cmi
 
 
+cacheDir = os.environ.get('TXT2BOIL_PYCACHE',
+                          os.path.join(os.path.expanduser('~'), '.cache',
+                                       'txt2boil', 'pygen'))
+
+# The PyGenPool that runs Python Gen code, or None to run it inline.
+executor = None
+
+# The functions compiled during this run, by their key.
+_functions = {}
+
+# The cache directories that have been checked, and whether they are
+# safe to use.
+_safe = {}
+
+
+def _source(body):
+    """Return the source of the function whose body is body."""
+
+    code = 'def foo(env):\n' + body
+    code = code.splitlines()
+    return '\n    '.join(code)
+
+
+def _key(body):
+    """Return the cache key of body for this interpreter."""
+
+    import hashlib
+    h = hashlib.sha256(body.encode('utf-8'))
+    h.update(str(sys.implementation.cache_tag).encode('utf-8'))
+    return h.hexdigest()
+
+
+def _cacheDir():
+    """Return cacheDir, creating it if need be, or None if it isn't safe
+    to use.
+
+    It is only used if it belongs to the user and neither its group
+    nor anyone else can write to it.  Interpreters without a cache
+    tag, which don't promise a stable marshal format, don't use it.
+
+    """
+
+    if cacheDir is None or sys.implementation.cache_tag is None:
+        return None
+    try:
+        return _safe[cacheDir]
+    except KeyError:
+        pass
+    try:
+        os.makedirs(cacheDir, 0o700, exist_ok=True)
+        st = os.stat(cacheDir)
+    except (IOError, OSError):
+        return None
+    safe = stat.S_ISDIR(st.st_mode) and not st.st_mode & 0o022
+    if hasattr(os, 'getuid'):
+        safe = safe and st.st_uid == os.getuid()
+    return _safe.setdefault(cacheDir, cacheDir if safe else None)
+
+
+def _load(key):
+    """Return the cached code object for key, or None if there isn't one.
+
+    """
+
+    path = _cacheDir()
+    if path is None:
+        return None
+    try:
+        with open(os.path.join(path, key), 'rb') as f:
+            return marshal.load(f)
+    except (IOError, OSError, EOFError, ValueError, TypeError):
+        return None
+
+
+def _store(key, code):
+    """Write code to the cache under key, ignoring any failure."""
+
+    path = _cacheDir()
+    if path is None:
+        return
+    import tempfile
+    try:
+        fd, tmp = tempfile.mkstemp(dir=path)
+        with os.fdopen(fd, 'wb') as f:
+            marshal.dump(code, f)
+        os.replace(tmp, os.path.join(path, key))
+    except (IOError, OSError):
+        pass
+
+
+def _function(body):
+    """Return the function defined by the Python Gen code in body.
+
+    Identical bodies share one function object.
+
+    """
+
+    key = _key(body)
+    try:
+        return _functions[key]
+    except KeyError:
+        pass
+    code = _load(key)
+    if code is None:
+        code = compile(_source(body), '<Python Gen>', 'exec')
+        _store(key, code)
+    env = {}
+    exec(code, env)
+    return _functions.setdefault(key, env['foo'])
+
+
+def _run(body, env):
+    """Run the Python Gen code in body on env."""
+
+    return _function(body)(env)
+
+
+# The queue that a worker process reports the snippets it starts and
+# finishes on, see PyGenPool.
+_started = None
+
+
+def _initWorker(queue):
+    """Set up a worker process to report on queue."""
+
+    global _started
+    _started = queue
+
+
+def _runReported(n, body, env):
+    """Run the Python Gen code in body on env, reporting its start and
+    end as snippet number n.
+
+    """
+
+    import time
+    _started.put((n, time.time()))
+    try:
+        return _run(body, env)
+    finally:
+        _started.put((n, None))
+
+
+def _pendingKey(body, env):
+    """Return the key that the pending run of body on env is kept under.
+
+    env is usually the whole stripped source, so it is reduced to a
+    digest rather than being kept alive and compared in full.
+
+    """
+
+    import hashlib
+    digest = hashlib.blake2b(env.encode('utf-8', 'surrogatepass'))
+    return body, len(env), digest.digest()
+
+
+class PyGenTimeout(GenError):
+
+    """Raised when Python Gen code runs for longer than it is allowed to.
+
+    """
+
+    pass
+
+
+class PyGenPool(object):
+
+    """Run Python Gen code in a pool of worker processes.
+
+    Snippets can be submitted ahead of time so that independent ones
+    run in parallel; run then waits for the result of the one that is
+    needed.  Each snippet may run for timeout seconds, counted from
+    when a worker starts it rather than from when it is waited for.
+    One that is needed and overruns raises PyGenTimeout; one that
+    isn't needed yet and overruns while the needed one waits for a
+    worker is given up on.  Either way the workers are restarted,
+    since there is no way to stop just the one that overran.
+
+    """
+
+    maxPending = 256
+
+    def __init__(self, processes=None, timeout=None):
+        self.processes = processes
+        self.timeout = timeout
+        self._pool = None
+        self._queue = None
+        self._count = 0
+        self._pending = collections.OrderedDict()
+        self._running = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def submit(self, body, env):
+        """Start running body on env unless it is already running."""
+
+        key = _pendingKey(body, env)
+        if key in self._pending:
+            return
+        self._submit(key, body, env)
+
+    def _submit(self, key, body, env):
+        if self._pool is None:
+            import multiprocessing
+            self._queue = multiprocessing.SimpleQueue()
+            self._pool = multiprocessing.Pool(self.processes, _initWorker,
+                                              (self._queue,))
+        self._count += 1
+        result = self._pool.apply_async(_runReported,
+                                        (self._count, body, env))
+        self._pending[key] = self._count, result
+        while len(self._pending) > self.maxPending:
+            self._pending.popitem(last=False)
+
+    def _poll(self):
+        """Read the start and end times that the workers reported."""
+
+        while not self._queue.empty():
+            n, t = self._queue.get()
+            if t is None:
+                self._running.pop(n, None)
+            else:
+                self._running[n] = t
+
+    def run(self, body, env):
+        """Return the output of body run on env."""
+
+        import time
+        key = _pendingKey(body, env)
+        if key not in self._pending:
+            self._submit(key, body, env)
+        n, result = self._pending.pop(key)
+        if self.timeout is None:
+            return result.get()
+        while not result.ready():
+            self._poll()
+            now = time.time()
+            if n in self._running:
+                left = self._running[n] + self.timeout - now
+                if left <= 0:
+                    self.terminate()
+                    raise PyGenTimeout('Python Gen code ran for more '
+                                       'than {} seconds'.format(
+                                           self.timeout))
+            else:
+                left = min([t + self.timeout - now
+                            for t in self._running.values()] or [0.01])
+                if left <= 0:
+                    self.terminate()
+                    self._submit(key, body, env)
+                    n, result = self._pending.pop(key)
+                    continue
+            result.wait(min(max(left, 0.001), 0.05))
+        return result.get()
+
+    def terminate(self):
+        """Stop the workers immediately and forget any pending work."""
+
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+        self._pool = None
+        self._pending.clear()
+        self._running.clear()
+
+    def close(self):
+        """Wait for the workers to finish and shut them down."""
+
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+        self._pool = None
+        self._pending.clear()
+        self._running.clear()
+
+
 class _PyGenHookedRegex(HookedRegex):
 
     """A special object that returns the regex r'^.*$' for the trigger.
@@ -39,12 +341,17 @@ class _PyGenHookedRegex(HookedRegex):
             return super(_PyGenHookedRegex, self).group(n - 1)
 
     def output(self, match):
-        code = 'def foo(env):\n' + self.group(2)
-        code = code.splitlines()
-        code = '\n    '.join(code)
-        env = {}
-        eval(code, env)
-        return env['foo'](match.group(0))
+        if not instrument.hooks:
+            out = self._output(match.group(0))
+        else:
+            with instrument.span('pygen', bytes=len(match.group(0))):
+                out = self._output(match.group(0))
+        return out if out.endswith('\n') else out + '\n'
+
+    def _output(self, env):
+        if executor is None:
+            return _run(self.group(2), env)
+        return executor.run(self.group(2), env)
 
 
 class PyGen(Gen):
@@ -80,6 +387,43 @@ class PyGen(Gen):
 
     """
 
+    _marker = r'(?s)Python Gen:\n(.*)'
+
+    @cmi.unionCMI(lambda: PyGen)
+    def markers(self):
+        return {'Python Gen:'}
+
     @cmi.nonNoneCMI(lambda: PyGen)
     def matchComment(self, comm):
-        return _PyGenHookedRegex(r'(?s)Python Gen:\n(.*)', '', comm)
+        return _PyGenHookedRegex(self._marker, '', comm)
+
+    @cmi.nonNoneCMI(lambda: PyGen)
+    def prefetch(self, text, start=0):
+        """Submit every Python Gen snippet in text to the executor.
+
+        Each one is run on the code as it will be when the snippet is
+        reached, assuming the generated regions before it don't
+        change.  That is always the case once a file is up to date,
+        and gen falls back to running the snippet again otherwise.
+
+        """
+
+        if executor is None:
+            return
+        view = None
+        scanner = _Scanner(text, self._commentFinders(), start)
+        for chunk in self._chunks(scanner):
+            cc = [p for (_, _, p) in chunk]
+            m = _PyGenHookedRegex(self._marker, '',
+                                  self.extractChunkContent(cc))
+            if m:
+                try:
+                    e = self.chunkEnd(chunk)
+                except GenError:
+                    continue
+                end = self.regionEnd(text, e)
+                if view is None:
+                    view = CodeView(self, text)
+                view.replace(e, end, '')
+                executor.submit(m.group(2), view.text)
+                view.replace(e, e, text[e:end])
@@ -0,0 +1,292 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""A long lived JSON-RPC 2.0 server.
+
+Run it with "python -m txt2boil serve" and send it one JSON message
+per line on standard input, or on each connection to the Unix socket
+given with --socket.  The language instances and compiled patterns
+stay warm between requests.  The methods are:
+
+generate
+    Params: text, and optionally lang (an extension such as "py"),
+    filename (to pick the language by its extension when lang isn't
+    given) and edits.  The result has the generated text, or when
+    edits is true, a list of the edits that turn the given text into
+    it.  Each edit has the start and end offsets of the replaced text,
+    their zero based [line, column] as startPos and endPos, and the
+    new text.
+
+languages
+    The result's languages member lists the supported languages and
+    their extensions.
+
+shutdown
+    Stop the server once the response is sent.
+
+Every result object and error's data has an elapsed_ms member with
+the time taken to handle the request.
+
+"""
+
+import argparse
+import inspect
+import json
+import os
+import socketserver
+import stat
+import sys
+import threading
+import time
+from . import languageClass
+from . import langs
+from .core import GenError
+
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+GEN_ERROR = -32000
+
+
+class RPCError(Exception):
+
+    """An error to send back as a JSON-RPC error object.
+
+    """
+
+    def __init__(self, code, message, data=None):
+        super(RPCError, self).__init__(message)
+        self.code = code
+        self.data = data
+
+
+def _position(text, offset):
+    """Return the zero based line and column of offset in text."""
+
+    line = text.count('\n', 0, offset)
+    return line, offset - (text.rfind('\n', 0, offset) + 1)
+
+
+class Server(object):
+
+    """Dispatch JSON-RPC requests to the rpc_* methods.
+
+    """
+
+    def __init__(self):
+        self.running = True
+        self._languages = {}
+
+    def language(self, lang=None, filename=None):
+        """Return the instance of the language for lang or filename."""
+
+        if lang is not None:
+            cls = languageClass(lang.lstrip('.'), True)
+        elif filename is not None:
+            cls = languageClass(filename)
+        else:
+            cls = langs.Unknown
+        try:
+            return self._languages[cls]
+        except KeyError:
+            return self._languages.setdefault(cls, cls())
+
+    def rpc_generate(self, text, lang=None, filename=None, edits=False):
+        language = self.language(lang, filename)
+        if not edits:
+            return {'text': language.gen(text)}
+        out = []
+        language.gen(text, edits=out)
+        return {'edits': [{'start': s, 'end': e,
+                           'startPos': _position(text, s),
+                           'endPos': _position(text, e),
+                           'text': new} for (s, e, new) in out]}
+
+    def rpc_languages(self):
+        return {'languages': [{'name': nm,
+                               'extensions': list(getattr(langs, nm).ext)}
+                              for nm in langs.__all__]}
+
+    def rpc_shutdown(self):
+        self.running = False
+        return {}
+
+    def call(self, method, params):
+        """Return the result of calling method with params."""
+
+        func = getattr(self, 'rpc_' + str(method), None)
+        if func is None:
+            raise RPCError(METHOD_NOT_FOUND,
+                           'Method not found: {}'.format(method))
+        try:
+            if isinstance(params, dict):
+                bound = inspect.signature(func).bind(**params)
+            else:
+                bound = inspect.signature(func).bind(*params)
+        except TypeError as err:
+            raise RPCError(INVALID_PARAMS, str(err))
+        return func(*bound.args, **bound.kwargs)
+
+    def handle(self, request):
+        """Return the response to the decoded request, or None if it
+        is a notification.
+
+        """
+
+        if isinstance(request, list):
+            if not request:
+                return self._error(None, RPCError(INVALID_REQUEST,
+                                                  'Empty batch'), 0)
+            out = [r for r in map(self.handle, request) if r is not None]
+            return out or None
+
+        begin = time.perf_counter()
+        rid = request.get('id') if isinstance(request, dict) else None
+        notification = isinstance(request, dict) and 'id' not in request
+        try:
+            if (not isinstance(request, dict) or
+                    request.get('jsonrpc') != '2.0' or
+                    'method' not in request):
+                raise RPCError(INVALID_REQUEST, 'Invalid request')
+            params = request.get('params', [])
+            if not isinstance(params, (dict, list)):
+                raise RPCError(INVALID_PARAMS, 'Invalid params')
+            result = self.call(request['method'], params)
+        except RPCError as err:
+            error = err
+        except GenError as err:
+            error = RPCError(GEN_ERROR, str(err), {'line': err.line})
+        except Exception as err:
+            error = RPCError(INTERNAL_ERROR,
+                             '{}: {}'.format(type(err).__name__, err))
+        else:
+            if notification:
+                return None
+            result['elapsed_ms'] = self._elapsed(begin)
+            return {'jsonrpc': '2.0', 'id': rid, 'result': result}
+        if notification and error.code != INVALID_REQUEST:
+            return None
+        return self._error(rid, error, begin)
+
+    def _elapsed(self, begin):
+        return (time.perf_counter() - begin) * 1000 if begin else 0.0
+
+    def _error(self, rid, err, begin):
+        data = dict(err.data or {}, elapsed_ms=self._elapsed(begin))
+        return {'jsonrpc': '2.0', 'id': rid,
+                'error': {'code': err.code, 'message': str(err),
+                          'data': data}}
+
+    def serve(self, rfile, wfile):
+        """Answer the requests read from rfile, one per line, on wfile
+        until it is closed or the server is shut down.
+
+        """
+
+        for line in rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as err:
+                response = self._error(None,
+                                       RPCError(PARSE_ERROR, str(err)), 0)
+            else:
+                response = self.handle(request)
+            if response is not None:
+                wfile.write(json.dumps(response) + '\n')
+                wfile.flush()
+            if not self.running:
+                break
+
+
+def serveSocket(server, path):
+    """Serve each connection to a Unix socket at path in a thread.
+
+    A socket left at path by an earlier server is removed first, but
+    FileExistsError is raised if anything else is there.
+
+    """
+
+    class Handler(socketserver.StreamRequestHandler):
+
+        def handle(self):
+            server.serve((l.decode('utf-8') for l in self.rfile),
+                         _Writer(self.wfile))
+            if not server.running:
+                threading.Thread(target=sock.shutdown).start()
+
+    try:
+        st = os.lstat(path)
+    except FileNotFoundError:
+        pass
+    else:
+        if not stat.S_ISSOCK(st.st_mode):
+            raise FileExistsError('{} exists and is not a socket'.format(
+                path))
+        os.unlink(path)
+    sock = socketserver.ThreadingUnixStreamServer(path, Handler)
+    sock.daemon_threads = True
+    try:
+        sock.serve_forever()
+    finally:
+        sock.server_close()
+        os.unlink(path)
+
+
+class _Writer(object):
+
+    """Write text to a binary file as UTF-8."""
+
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, text):
+        self.f.write(text.encode('utf-8'))
+
+    def flush(self):
+        self.f.flush()
+
+
+def main(argv=sys.argv[1:]):
+    """Run the server."""
+
+    parser = argparse.ArgumentParser(
+        prog='txt2boil serve',
+        description='Serve JSON-RPC requests, one per line.')
+    parser.add_argument('--socket', metavar='PATH',
+                        help='listen on a Unix socket instead of standard '
+                        'input and output')
+    args = parser.parse_args(argv)
+
+    server = Server()
+    try:
+        if args.socket is None:
+            server.serve(sys.stdin, sys.stdout)
+        else:
+            serveSocket(server, args.socket)
+    except FileExistsError as err:
+        parser.error(str(err))
+    except KeyboardInterrupt:
+        pass
+
+
+__all__ = ['Server', 'RPCError', 'serveSocket', 'main']
@@ -0,0 +1,111 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Summarize the phases reported through txt2boil.core.instrument.
+
+Stats collects the phases of each file, which may have been processed
+in other processes, and can print a summary of them or write them out
+as Chrome trace events (viewable in chrome://tracing or Perfetto).
+
+"""
+
+import json
+
+
+class Stats(object):
+
+    """The phases reported while processing a set of files.
+
+    """
+
+    def __init__(self):
+        self.events = []
+        self.files = []
+
+    def add(self, fname, pid, events):
+        """Add the (phase, start, duration, info) events reported by
+        process pid while processing fname.
+
+        """
+
+        self.events.extend((pid, e) for e in events)
+        phases = {}
+        total = 0.0
+        for phase, _, duration, info in events:
+            if phase == 'file':
+                total = duration
+            else:
+                phases[phase] = phases.get(phase, 0.0) + duration
+        self.files.append((total, fname, phases))
+
+    def totals(self):
+        """Return a dictionary of the total duration, count and bytes of
+        each phase.
+
+        """
+
+        out = {}
+        for _, (phase, _, duration, info) in self.events:
+            t = out.setdefault(phase, {'duration': 0.0, 'count': 0,
+                                       'bytes': 0})
+            t['duration'] += duration
+            t['count'] += info.get('count', 1)
+            t['bytes'] += info.get('bytes', 0)
+        return out
+
+    def report(self, f, slowest=10):
+        """Write a summary of the phases, and of the slowest files, to f.
+
+        """
+
+        totals = self.totals()
+        f.write('{:<10} {:>10} {:>12} {:>14}\n'.format('phase', 'count',
+                                                      'time (ms)', 'bytes'))
+        for phase, t in sorted(totals.items(),
+                               key=lambda a: -a[1]['duration']):
+            f.write('{:<10} {:>10} {:>12.3f} {:>14}\n'.format(
+                phase, t['count'], t['duration'] * 1000, t['bytes']))
+
+        if not self.files:
+            return
+        f.write('\nslowest files:\n')
+        for total, fname, phases in sorted(self.files, reverse=True,
+                                           key=lambda a: a[0])[:slowest]:
+            detail = ', '.join('{} {:.3f}'.format(p, d * 1000)
+                               for (p, d) in sorted(phases.items(),
+                                                    key=lambda a: -a[1]))
+            f.write('{:>10.3f} ms  {}  ({})\n'.format(total * 1000, fname,
+                                                      detail))
+
+    def trace(self):
+        """Return the phases as a Chrome trace-event object."""
+
+        return {'traceEvents': [
+            {'name': phase, 'cat': 'txt2boil', 'ph': 'X',
+             'ts': start * 1e6, 'dur': duration * 1e6,
+             'pid': pid, 'tid': pid, 'args': info}
+            for pid, (phase, start, duration, info) in self.events]}
+
+    def writeTrace(self, fname):
+        """Write the phases to fname as Chrome trace-event JSON."""
+
+        with open(fname, 'w') as f:
+            json.dump(self.trace(), f)
+
+
+__all__ = ['Stats']
@@ -0,0 +1,302 @@
+# Copyright (C) 2014 Kieran Colford
+#
+# This file is part of txt2boil.
+#
+# txt2boil is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# txt2boil is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with txt2boil.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Watch files and directories for changes.
+
+watcher returns an InotifyWatcher where inotify is available and a
+PollWatcher otherwise.  Both report the files that changed since the
+last call to poll, and both can be told to skip the change made by a
+write of our own, so that regenerating a file in place doesn't make it
+look changed again.
+
+"""
+
+import os
+import select
+import struct
+import time
+from . import files
+
+
+def _signature(path):
+    """Return what identifies the current contents of path, or None if
+    it isn't a file.
+
+    """
+
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not os.path.isfile(path):
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+class _Watcher(object):
+
+    """The parts shared by all watchers.
+
+    fnames are watched files and dirs are directories whose files are
+    watched as files.walk would find them with exts and ignore.
+
+    """
+
+    def __init__(self, fnames, dirs, exts, ignore=None):
+        self.fnames = {os.path.normpath(f) for f in fnames}
+        self.dirs = list(dirs)
+        self.exts = exts
+        self.ignore = ignore
+        self._own = {}
+
+    def wanted(self, path):
+        """Return True if path is one of the watched files."""
+
+        path = os.path.normpath(path)
+        if path in self.fnames:
+            return True
+        return any(files.accepts(d, path, self.exts, self.ignore)
+                   for d in self.dirs)
+
+    def skip(self, path):
+        """Don't report the change just made to path by this process.
+
+        """
+
+        self._own[os.path.normpath(path)] = _signature(path)
+
+    def _report(self, paths):
+        """Return the paths that really changed, in order, each once.
+
+        """
+
+        out = []
+        for path in paths:
+            path = os.path.normpath(path)
+            sig = _signature(path)
+            if sig is None or path in out:
+                continue
+            if path in self._own and self._own.pop(path) == sig:
+                continue
+            out.append(path)
+        return out
+
+    def _files(self):
+        """Yield all the watched files."""
+
+        for f in sorted(self.fnames):
+            yield f
+        for d in self.dirs:
+            for f in files.walk(d, self.exts, self.ignore):
+                yield os.path.normpath(f)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PollWatcher(_Watcher):
+
+    """Watch files by comparing their status every interval seconds.
+
+    """
+
+    def __init__(self, fnames, dirs, exts, ignore=None, interval=0.25):
+        super(PollWatcher, self).__init__(fnames, dirs, exts, ignore)
+        self.interval = interval
+        self._stats = self._scan()
+
+    def _scan(self):
+        return {f: _signature(f) for f in self._files()}
+
+    def poll(self, timeout=None):
+        """Return the files that changed, waiting up to timeout seconds
+        (or forever) for there to be any.
+
+        """
+
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            stats = self._scan()
+            paths = [f for (f, sig) in stats.items()
+                     if sig != self._stats.get(f)]
+            self._stats = stats
+            paths = self._report(sorted(paths))
+            if paths:
+                return paths
+            delay = self.interval
+            if deadline is not None:
+                delay = min(delay, deadline - time.time())
+                if delay <= 0:
+                    return []
+            time.sleep(delay)
+
+
+# The inotify constants from <sys/inotify.h>.
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+_event = struct.Struct('iIII')
+_libc = None
+
+
+def _inotify():
+    """Return the C library with the inotify functions.
+
+    Raise OSError where there isn't one.
+
+    """
+
+    global _libc
+    if _libc is None:
+        import ctypes
+        import ctypes.util
+        name = ctypes.util.find_library('c')
+        libc = ctypes.CDLL(name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError('inotify is not available')
+        _libc = libc
+    return _libc
+
+
+class InotifyWatcher(_Watcher):
+
+    """Watch files through the directories that contain them with
+    inotify.
+
+    """
+
+    mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+    def __init__(self, fnames, dirs, exts, ignore=None):
+        super(InotifyWatcher, self).__init__(fnames, dirs, exts, ignore)
+        import ctypes
+        self._libc = _inotify()
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._wds = {}
+        try:
+            for f in self.fnames:
+                self._add(os.path.dirname(f) or os.curdir)
+            for d in self.dirs:
+                for sub in files.walk(d, self.exts, self.ignore, True):
+                    self._add(sub)
+        except BaseException:
+            self.close()
+            raise
+
+    def _add(self, dname):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(dname),
+                                          self.mask)
+        if wd >= 0:
+            self._wds[wd] = dname
+
+    def _read(self):
+        """Return the paths named by the pending events."""
+
+        paths = []
+        while True:
+            try:
+                data = os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                return paths
+            i = 0
+            while i < len(data):
+                wd, mask, _, n = _event.unpack_from(data, i)
+                name = data[i + _event.size:i + _event.size + n]
+                i += _event.size + n
+                if mask & IN_Q_OVERFLOW:
+                    paths.extend(self._files())
+                    continue
+                if mask & IN_IGNORED:
+                    self._wds.pop(wd, None)
+                    continue
+                if wd not in self._wds:
+                    continue
+                path = os.path.join(self._wds[wd],
+                                    os.fsdecode(name.rstrip(b'\0')))
+                if mask & IN_ISDIR:
+                    paths.extend(self._newDir(path))
+                elif mask & IN_CREATE:
+                    continue        # wait for the file to be written
+                elif self.wanted(path):
+                    paths.append(path)
+
+    def _newDir(self, path):
+        """Start watching a new directory and return the watched files
+        that are already in it.
+
+        """
+
+        out = []
+        for d in self.dirs:
+            if not files.accepts(d, path, self.exts, self.ignore, True):
+                continue
+            for sub in files.walk(path, self.exts, self.ignore, True):
+                self._add(sub)
+            out.extend(f for f in files.walk(path, self.exts, self.ignore)
+                       if self.wanted(f))
+        return out
+
+    def poll(self, timeout=None):
+        """Return the files that changed, waiting up to timeout seconds
+        (or forever) for there to be any.
+
+        """
+
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            delay = None
+            if deadline is not None:
+                delay = max(0, deadline - time.time())
+            if not select.select([self.fd], [], [], delay)[0]:
+                return []
+            paths = self._report(self._read())
+            if paths:
+                return paths
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def watcher(fnames, dirs, exts, ignore=None):
+    """Return the best available watcher of the files fnames and the
+    directories dirs.
+
+    """
+
+    try:
+        return InotifyWatcher(fnames, dirs, exts, ignore)
+    except (OSError, AttributeError):
+        return PollWatcher(fnames, dirs, exts, ignore)
+
+
+__all__ = ['PollWatcher', 'InotifyWatcher', 'watcher']